@@ -5,6 +5,7 @@ Now with REAL satellite data from Copernicus Sentinel-2!
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import sqlite3
 import json
@@ -32,7 +33,10 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="EcoMind API",
     description="Forest monitoring and environmental data API",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson writes the response bytes; FastAPI's jsonable_encoder still runs on returned
+    # dicts first, so endpoints must hand back plain Python types, not numpy scalars
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS for frontend integration
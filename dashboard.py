@@ -4,20 +4,18 @@ Interactive web interface for Urban Forest Intelligence
 """
 
 import streamlit as st
-import folium
-from streamlit_folium import st_folium
 import numpy as np
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
 import requests
 import json
+import csv
+import io
 import sqlite3
 from pathlib import Path
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from functools import lru_cache
 
 # Page configuration
 st.set_page_config(
@@ -27,6 +25,10 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Single wall-clock reading shared by everything in this rerun
+NOW = datetime.now()
+NOW_STR = NOW.strftime('%Y-%m-%d %H:%M:%S')
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -86,6 +88,80 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+# Metric card markup shared by every ai-metric-container block
+METRIC_TPL = (
+    '<div class="ai-metric-container">'
+    '<div class="ai-metric-label">{label}</div>'
+    '<div class="ai-metric-value"{value_style}>{value}</div>'
+    '<div class="ai-metric-delta"{delta_style}>{delta}</div>'
+    '</div>'
+)
+
+@lru_cache(maxsize=256)
+def metric_card(label: str, value: str, delta: str,
+                value_color: Optional[str] = None, delta_color: Optional[str] = None) -> str:
+    """Render a styled metric card from METRIC_TPL"""
+    return METRIC_TPL.format(
+        label=label,
+        value=value,
+        delta=delta,
+        value_style=f' style="color: {value_color};"' if value_color else '',
+        delta_style=f' style="color: {delta_color};"' if delta_color else ''
+    )
+
+# Plain-text report layout, filled by build_report_text
+REPORT_TMPL = """EcoMind Forest Intelligence Report
+==================================================
+
+Location: {location}
+Generated: {generated}
+Coordinates: {lat:.4f}, {lon:.4f}
+
+FOREST METRICS
+====================
+Total Trees: {tree_count:,}
+Forest Area: {tree_area_ha:.1f} hectares
+Forest Coverage: {forest_coverage}%
+Carbon Sequestration: {carbon_tons:.1f} tons/year
+
+TREE HEALTH DISTRIBUTION
+=========================
+Healthy Trees: {healthy_trees:,} ({healthy_pct:.1f}%)
+Moderate Condition: {moderate_trees:,} ({moderate_pct:.1f}%)
+Stressed Trees: {stressed_trees:,} ({stressed_pct:.1f}%)
+Unhealthy Trees: {unhealthy_trees:,} ({unhealthy_pct:.1f}%)
+
+ENVIRONMENTAL CONDITIONS
+========================
+NDVI Index: {ndvi_mean:.3f}
+Air Quality (PM2.5): {pm25} µg/m³
+Air Quality (PM10): {pm10} µg/m³
+AQI: {aqi}
+Temperature: {temperature_c}°C
+Humidity: {humidity_percent}%
+Wind Speed: {wind_speed_kmh} km/h
+
+SATELLITE DATA
+==============
+Cloud Cover: {cloud_cover}%
+Last Capture: {last_capture}
+Resolution: {resolution_m}m
+
+ANALYSIS SUMMARY
+================
+This report provides a comprehensive assessment of urban forest 
+conditions in {location}. The data is collected from multiple 
+sources including satellite imagery, environmental sensors, and 
+field monitoring systems.
+
+Trees per Hectare: {trees_per_ha}
+Carbon per Tree: {carbon_per_tree:.1f} kg/tree/year
+Health Score: {health_score:.1f}/100
+
+Generated by EcoMind - Urban Forest Intelligence System
+Report ID: ECM-{report_id}
+"""
+
 # Header
 st.markdown('<h1 class="main-header">🌳 EcoMind: Urban Forest Intelligence</h1>', 
             unsafe_allow_html=True)
@@ -120,7 +196,7 @@ class SatelliteDataAPI:
         return {
             'ndvi_mean': round(ndvi_mean, 3),
             'cloud_cover': random.randint(5, 25),
-            'last_capture': (datetime.now() - timedelta(hours=random.randint(1, 12))).strftime('%Y-%m-%d %H:%M:%S')
+            'last_capture': (NOW - timedelta(hours=random.randint(1, 12))).strftime('%Y-%m-%d %H:%M:%S')
         }
     
     def fetch_area_data(self, coordinates: list) -> Dict[str, Any]:
@@ -169,7 +245,7 @@ class EnvironmentalSensorNetwork:
             'pm25': pm25,
             'pm10': pm10,
             'aqi': min(500, pm25 * 2),  # Simplified AQI calculation
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'timestamp': NOW_STR
         }
     
     def fetch_weather_data(self, coordinates: list) -> Dict[str, Any]:
@@ -219,11 +295,20 @@ class ForestAnalyticsDB:
     
     def fetch_latest_data(self, location: str) -> Dict[str, Any]:
         """Fetch latest forest data from database"""
-        conn = sqlite3.connect(self.db_path)
+        # Read-only, shared-cache connection: no write locks or journal on the hot read path
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro&cache=shared', uri=True)
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         cursor.execute(
-            'SELECT * FROM forest_monitoring WHERE location = ? ORDER BY timestamp DESC LIMIT 1',
+            """
+            SELECT tree_count, healthy_count, moderate_count, stressed_count,
+                   unhealthy_count, carbon_tons, timestamp
+            FROM forest_monitoring
+            WHERE location = ?
+            ORDER BY timestamp DESC
+            LIMIT 1
+            """,
             (location,)
         )
         
@@ -232,25 +317,25 @@ class ForestAnalyticsDB:
         
         if result:
             return {
-                'tree_count': result[3],
-                'healthy_trees': result[4],
-                'moderate_trees': result[5],
-                'stressed_trees': result[6],
-                'unhealthy_trees': result[7],
-                'carbon_tons': result[8],
-                'last_updated': result[2]
+                'tree_count': result['tree_count'],
+                'healthy_trees': result['healthy_count'],
+                'moderate_trees': result['moderate_count'],
+                'stressed_trees': result['stressed_count'],
+                'unhealthy_trees': result['unhealthy_count'],
+                'carbon_tons': result['carbon_tons'],
+                'last_updated': result['timestamp']
             }
         
         return None
     
-    def update_forest_data(self, location: str, data: Dict[str, Any]):
+    def update_forest_data(self, location: str, data: Dict[str, Any], timestamp: Optional[str] = None):
         """Update forest data in database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute(
             'INSERT INTO forest_monitoring (location, timestamp, tree_count, healthy_count, moderate_count, stressed_count, unhealthy_count, carbon_tons) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-            (location, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
+            (location, timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
              data['tree_count'], data['healthy_trees'], data['moderate_trees'], 
              data['stressed_trees'], data['unhealthy_trees'], data['carbon_tons'])
         )
@@ -488,11 +573,11 @@ def fetch_real_time_data(location: str) -> Dict[str, Any]:
                     'stressed_trees': int(total_trees * stressed_pct),
                     'unhealthy_trees': int(total_trees * unhealthy_pct),
                     'carbon_tons': round(area_ha * 3.5 * ndvi_data['ndvi_mean'], 2),
-                    'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    'last_updated': NOW_STR
                 }
                 
                 # Save to database
-                forest_db.update_forest_data(location, forest_data)
+                forest_db.update_forest_data(location, forest_data, NOW_STR)
             
             # Combine all data
             combined_data = {
@@ -644,10 +729,15 @@ if 'location_input' in st.session_state and st.session_state.location_input:
 # Fetch real-time data FIRST (before using it in sidebar)
 data = fetch_real_time_data(location)
 
+# Health category percentages (healthy, moderate, stressed, unhealthy), computed once per rerun
+health_counts = np.array([data['healthy_trees'], data['moderate_trees'],
+                          data['stressed_trees'], data['unhealthy_trees']], dtype=float)
+data['ratios'] = health_counts / data['tree_count'] * 100 if data['tree_count'] else np.zeros(4)
+
 # Date range
 st.sidebar.subheader("📅 Analysis Period")
-start_date = st.sidebar.date_input("Start Date", datetime.now() - timedelta(days=30))
-end_date = st.sidebar.date_input("End Date", datetime.now())
+start_date = st.sidebar.date_input("Start Date", NOW - timedelta(days=30))
+end_date = st.sidebar.date_input("End Date", NOW)
 
 # Data refresh controls
 st.sidebar.markdown("---")
@@ -698,7 +788,7 @@ class SatelliteDataAPI:
             'ndvi_mean': round(np.clip(current_ndvi, 0, 1), 3),
             'ndvi_std': round(random.uniform(0.12, 0.18), 3),
             'cloud_cover': round(random.uniform(5, 25), 1),
-            'last_capture': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            'last_capture': NOW_STR
         }
     
     @staticmethod
@@ -787,11 +877,20 @@ class ForestAnalyticsDB:
     
     def fetch_latest_data(self, location: str) -> Dict[str, Any]:
         """Fetch latest forest data from database"""
-        conn = sqlite3.connect(self.db_path)
+        # Read-only, shared-cache connection: no write locks or journal on the hot read path
+        conn = sqlite3.connect(f'file:{self.db_path}?mode=ro&cache=shared', uri=True)
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         cursor.execute(
-            'SELECT * FROM forest_monitoring WHERE location = ? ORDER BY timestamp DESC LIMIT 1',
+            """
+            SELECT tree_count, healthy_count, moderate_count, stressed_count,
+                   unhealthy_count, carbon_tons, timestamp
+            FROM forest_monitoring
+            WHERE location = ?
+            ORDER BY timestamp DESC
+            LIMIT 1
+            """,
             (location,)
         )
         
@@ -800,25 +899,25 @@ class ForestAnalyticsDB:
         
         if result:
             return {
-                'tree_count': result[3],
-                'healthy_trees': result[4],
-                'moderate_trees': result[5],
-                'stressed_trees': result[6],
-                'unhealthy_trees': result[7],
-                'carbon_tons': result[8],
-                'last_updated': result[2]
+                'tree_count': result['tree_count'],
+                'healthy_trees': result['healthy_count'],
+                'moderate_trees': result['moderate_count'],
+                'stressed_trees': result['stressed_count'],
+                'unhealthy_trees': result['unhealthy_count'],
+                'carbon_tons': result['carbon_tons'],
+                'last_updated': result['timestamp']
             }
         
         return None
     
-    def update_forest_data(self, location: str, data: Dict[str, Any]):
+    def update_forest_data(self, location: str, data: Dict[str, Any], timestamp: Optional[str] = None):
         """Update forest data in database"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         cursor.execute(
             'INSERT INTO forest_monitoring (location, timestamp, tree_count, healthy_count, moderate_count, stressed_count, unhealthy_count, carbon_tons) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-            (location, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
+            (location, timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 
              data['tree_count'], data['healthy_trees'], data['moderate_trees'], 
              data['stressed_trees'], data['unhealthy_trees'], data['carbon_tons'])
         )
@@ -826,9 +925,98 @@ class ForestAnalyticsDB:
         conn.commit()
         conn.close()
 
+@st.cache_data(ttl=30)
+def get_model_artifacts_status(model_path: str, training_log_path: str) -> Tuple[bool, bool]:
+    """Check whether the trained model and its training log exist"""
+    return Path(model_path).exists(), Path(training_log_path).exists()
+
+@st.cache_data(ttl=30)
+def load_training_metrics(path: str, mtime: float) -> Dict[str, Any]:
+    """Load the training log; mtime is part of the cache key so a retrain is picked up"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+@st.cache_data(ttl=60)
+def model_file_size(path: str) -> int:
+    """Size of the model file in bytes, 0 if it does not exist"""
+    return Path(path).stat().st_size if Path(path).exists() else 0
+
+def lttb_downsample(x, y, n_out: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets downsampling; short series are returned unchanged"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out < 3 or n <= n_out:
+        return x, y
+    
+    # First and last points are always kept; the rest are split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        
+        # Pick the point forming the largest triangle with the previous pick and the next bucket's mean
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    
+    return x[keep], y[keep]
+
+@st.fragment
+def render_training_history(epochs: list, accuracies: list, losses: list):
+    """Render the training history charts; the epoch range slider reruns only this fragment"""
+    import plotly.graph_objects as go
+    
+    # Epochs are numbered 1..N, so the selected range maps straight onto list slices
+    if len(epochs) > 1:
+        first, last = st.slider("Epoch range", min_value=epochs[0], max_value=epochs[-1],
+                                value=(epochs[0], epochs[-1]), key='training_history_epochs')
+        lo, hi = first - epochs[0], last - epochs[0] + 1
+        epochs, accuracies, losses = epochs[lo:hi], accuracies[lo:hi], losses[lo:hi]
+    
+    # Cap what goes over the websocket; long runs carry far more points than the chart can show
+    acc_epochs, accuracies = lttb_downsample(epochs, accuracies)
+    loss_epochs, losses = lttb_downsample(epochs, losses)
+    
+    fig_history = go.Figure()
+    fig_history.add_trace(go.Scattergl(
+        x=acc_epochs, y=accuracies,
+        mode='lines+markers',
+        name='Training Accuracy',
+        line=dict(color='#2d6a4f')
+    ))
+    
+    # Add secondary y-axis for loss
+    fig_history2 = go.Figure()
+    fig_history2.add_trace(go.Scattergl(
+        x=loss_epochs, y=losses,
+        mode='lines+markers',
+        name='Training Loss',
+        line=dict(color='#e74c3c')
+    ))
+    
+    fig_history.update_layout(
+        title='Real Training Progress',
+        xaxis_title='Epoch',
+        yaxis_title='Accuracy',
+        height=350
+    )
+    st.plotly_chart(fig_history, use_container_width=True)
+
 
 # Main content based on analysis type
 if analysis_type == "🏠 Overview Dashboard":
+    # Heavy plotting/mapping libraries are imported only by the branch that uses them
+    import folium
+    from streamlit_folium import st_folium
+    import plotly.express as px
+    import plotly.graph_objects as go
     
     # Real-time data status
     if 'satellite_info' in data:
@@ -854,41 +1042,17 @@ if analysis_type == "🏠 Overview Dashboard":
     health_delta = round(1.0 + (location_hash * 0.005), 1)
     
     with col1:
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌳 Total Trees</div>
-            <div class="ai-metric-value">{data['tree_count']:,}</div>
-            <div class="ai-metric-delta">↑ {tree_delta:,} this month</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌳 Total Trees", f"{data['tree_count']:,}", f"↑ {tree_delta:,} this month"), unsafe_allow_html=True)
     
     with col2:
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌲 Forest Area</div>
-            <div class="ai-metric-value">{data['tree_area_ha']:.1f} ha</div>
-            <div class="ai-metric-delta">↑ {area_delta} ha this month</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌲 Forest Area", f"{data['tree_area_ha']:.1f} ha", f"↑ {area_delta} ha this month"), unsafe_allow_html=True)
     
     with col3:
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">💨 CO₂ Sequestration</div>
-            <div class="ai-metric-value">{data['carbon_tons']:.0f} t/year</div>
-            <div class="ai-metric-delta">↑ {carbon_delta} t this month</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("💨 CO₂ Sequestration", f"{data['carbon_tons']:.0f} t/year", f"↑ {carbon_delta} t this month"), unsafe_allow_html=True)
     
     with col4:
-        health_percentage = (data['healthy_trees'] / data['tree_count']) * 100
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🏥 Forest Health</div>
-            <div class="ai-metric-value">{health_percentage:.1f}%</div>
-            <div class="ai-metric-delta">↑ {health_delta}% this month</div>
-        </div>
-        """, unsafe_allow_html=True)
+        health_percentage = data['ratios'][0]
+        st.markdown(metric_card("🏥 Forest Health", f"{health_percentage:.1f}%", f"↑ {health_delta}% this month"), unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -929,12 +1093,12 @@ if analysis_type == "🏠 Overview Dashboard":
         st.subheader("📊 Health Distribution")
         
         # Pie chart for health distribution
-        health_data = pd.DataFrame({
+        health_data = {
             'Category': ['Healthy', 'Moderate', 'Stressed', 'Unhealthy'],
             'Count': [data['healthy_trees'], data['moderate_trees'], 
                      data['stressed_trees'], data['unhealthy_trees']],
             'Color': ['#2d6a4f', '#52b788', '#ffc107', '#dc3545']
-        })
+        }
         
         fig_pie = px.pie(
             health_data, 
@@ -986,6 +1150,7 @@ if analysis_type == "🏠 Overview Dashboard":
         st.plotly_chart(fig_trend, use_container_width=True)
 
 elif analysis_type == "🏥 Tree Health Monitor":
+    import plotly.express as px
     
     st.header("🏥 Comprehensive Tree Health Assessment")
     
@@ -995,17 +1160,12 @@ elif analysis_type == "🏥 Tree Health Monitor":
         st.subheader("📊 Health Metrics")
         
         # Health statistics
-        health_df = pd.DataFrame({
+        health_df = {
             'Status': ['Healthy', 'Moderate', 'Stressed', 'Unhealthy'],
             'Count': [data['healthy_trees'], data['moderate_trees'], 
                      data['stressed_trees'], data['unhealthy_trees']],
-            'Percentage': [
-                data['healthy_trees']/data['tree_count']*100,
-                data['moderate_trees']/data['tree_count']*100,
-                data['stressed_trees']/data['tree_count']*100,
-                data['unhealthy_trees']/data['tree_count']*100
-            ]
-        })
+            'Percentage': data['ratios']
+        }
         
         fig_health = px.bar(
             health_df, 
@@ -1046,15 +1206,18 @@ elif analysis_type == "🏥 Tree Health Monitor":
     # Alert system
     st.subheader("🚨 Health Alerts")
     
-    if data['unhealthy_trees'] / data['tree_count'] > 0.1:
-        st.error(f"⚠️ **High Alert**: {data['unhealthy_trees']:,} unhealthy trees detected ({data['unhealthy_trees']/data['tree_count']*100:.1f}%)")
+    healthy_pct, _, stressed_pct, unhealthy_pct = data['ratios']
     
-    if data['stressed_trees'] / data['tree_count'] > 0.15:
-        st.warning(f"⚠️ **Medium Alert**: {data['stressed_trees']:,} stressed trees require attention ({data['stressed_trees']/data['tree_count']*100:.1f}%)")
+    if unhealthy_pct > 10:
+        st.error(f"⚠️ **High Alert**: {data['unhealthy_trees']:,} unhealthy trees detected ({unhealthy_pct:.1f}%)")
     
-    st.success(f"✅ **Good News**: {data['healthy_trees']:,} trees are in excellent health ({data['healthy_trees']/data['tree_count']*100:.1f}%)")
+    if stressed_pct > 15:
+        st.warning(f"⚠️ **Medium Alert**: {data['stressed_trees']:,} stressed trees require attention ({stressed_pct:.1f}%)")
+    
+    st.success(f"✅ **Good News**: {data['healthy_trees']:,} trees are in excellent health ({healthy_pct:.1f}%)")
 
 elif analysis_type == "💨 Carbon Analytics":
+    import plotly.express as px
     
     st.header("💨 Carbon Sequestration Analysis")
     
@@ -1062,33 +1225,15 @@ elif analysis_type == "💨 Carbon Analytics":
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">💨 Annual CO₂ Absorption</div>
-            <div class="ai-metric-value">{data['carbon_tons']:.0f} tons</div>
-            <div class="ai-metric-delta">Per year sequestration</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("💨 Annual CO₂ Absorption", f"{data['carbon_tons']:.0f} tons", "Per year sequestration"), unsafe_allow_html=True)
     
     with col2:
         cars_offset = int(data['carbon_tons'] / 4.6)
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🚗 Cars Offset Equivalent</div>
-            <div class="ai-metric-value">{cars_offset:,}</div>
-            <div class="ai-metric-delta">Vehicle emissions offset</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🚗 Cars Offset Equivalent", f"{cars_offset:,}", "Vehicle emissions offset"), unsafe_allow_html=True)
     
     with col3:
         trees_per_ha = int(data['tree_count'] / data['tree_area_ha']) if data['tree_area_ha'] > 0 else 0
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌳 Trees per Hectare</div>
-            <div class="ai-metric-value">{trees_per_ha}</div>
-            <div class="ai-metric-delta">Forest density</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌳 Trees per Hectare", str(trees_per_ha), "Forest density"), unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -1131,7 +1276,7 @@ elif analysis_type == "💨 Carbon Analytics":
     with col2:
         st.subheader("🌍 Environmental Benefits")
         
-        impact_data = pd.DataFrame({
+        impact_data = {
             'Metric': [
                 '💨 CO₂ Absorbed',
                 '🌬️ O₂ Produced', 
@@ -1144,7 +1289,7 @@ elif analysis_type == "💨 Carbon Analytics":
                 f"{data['tree_area_ha']*50:.0f} kg/year",
                 f"{data['tree_area_ha']*2500:.0f} liters/year"
             ]
-        })
+        }
         
         st.table(impact_data)
         
@@ -1172,6 +1317,7 @@ elif analysis_type == "💨 Carbon Analytics":
         """, unsafe_allow_html=True)
 
 elif analysis_type == "📅 Change Detection":
+    import plotly.graph_objects as go
     
     st.header("📅 Temporal Change Analysis")
     
@@ -1181,64 +1327,28 @@ elif analysis_type == "📅 Change Detection":
         st.subheader("📊 2023 Baseline")
         baseline_count = int(data['tree_count'] * 0.85)
         baseline_area = round(data['tree_area_ha'] * 0.87, 1)
-        baseline_health = round((data['healthy_trees'] / data['tree_count']) * 100 - 2.2, 1)
+        baseline_health = round(float(data['ratios'][0]) - 2.2, 1)
         
         # Using custom styled metrics for better visibility
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌳 Tree Count (Baseline)</div>
-            <div class="ai-metric-value">{baseline_count:,}</div>
-            <div class="ai-metric-delta">2023 Historical Data</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌳 Tree Count (Baseline)", f"{baseline_count:,}", "2023 Historical Data"), unsafe_allow_html=True)
         
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌲 Forest Area (Baseline)</div>
-            <div class="ai-metric-value">{baseline_area} ha</div>
-            <div class="ai-metric-delta">2023 Coverage</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌲 Forest Area (Baseline)", f"{baseline_area} ha", "2023 Coverage"), unsafe_allow_html=True)
         
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🏥 Health Score (Baseline)</div>
-            <div class="ai-metric-value">{baseline_health}%</div>
-            <div class="ai-metric-delta">2023 Average Health</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🏥 Health Score (Baseline)", f"{baseline_health}%", "2023 Average Health"), unsafe_allow_html=True)
     
     with col2:
         st.subheader("📊 2024 Current")
         growth_count = data['tree_count'] - baseline_count
         growth_area = round(data['tree_area_ha'] - baseline_area, 1)
-        current_health = round((data['healthy_trees'] / data['tree_count']) * 100, 1)
+        current_health = round(float(data['ratios'][0]), 1)
         growth_health = round(current_health - baseline_health, 1)
         
         # Current metrics with growth indicators
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌳 Tree Count (Current)</div>
-            <div class="ai-metric-value">{data['tree_count']:,}</div>
-            <div class="ai-metric-delta" style="color: #4ade80;">↑ +{growth_count:,} growth</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌳 Tree Count (Current)", f"{data['tree_count']:,}", f"↑ +{growth_count:,} growth", delta_color="#4ade80"), unsafe_allow_html=True)
         
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🌲 Forest Area (Current)</div>
-            <div class="ai-metric-value">{data['tree_area_ha']:.1f} ha</div>
-            <div class="ai-metric-delta" style="color: #4ade80;">↑ +{growth_area} ha growth</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🌲 Forest Area (Current)", f"{data['tree_area_ha']:.1f} ha", f"↑ +{growth_area} ha growth", delta_color="#4ade80"), unsafe_allow_html=True)
         
-        st.markdown(f"""
-        <div class="ai-metric-container">
-            <div class="ai-metric-label">🏥 Health Score (Current)</div>
-            <div class="ai-metric-value">{current_health:.1f}%</div>
-            <div class="ai-metric-delta" style="color: #4ade80;">↑ +{growth_health:.1f}% improvement</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(metric_card("🏥 Health Score (Current)", f"{current_health:.1f}%", f"↑ +{growth_health:.1f}% improvement", delta_color="#4ade80"), unsafe_allow_html=True)
     
     st.markdown("---")
     
@@ -1246,20 +1356,21 @@ elif analysis_type == "📅 Change Detection":
     st.subheader("📈 18-Month Evolution")
     
     # Generate location-specific time series data
-    dates = pd.date_range('2023-03', '2024-09', freq='M')
+    dates = np.arange('2023-04', '2024-10', dtype='datetime64[M]').astype('datetime64[D]') - 1  # month ends
     
     # Base count varies by location (85% of current count)
     base_count = int(data['tree_count'] * 0.85)
     growth_rate = (data['tree_count'] - base_count) / len(dates)
     
-    tree_evolution = []
-    for i, date in enumerate(dates):
-        # Realistic growth pattern with some variation
-        growth = base_count + (i * growth_rate) + random.randint(-int(growth_rate*0.1), int(growth_rate*0.1))
-        tree_evolution.append(int(growth))
+    # Realistic growth pattern with some variation, drawn in one batch
+    location_seed = hash(location) % 1000
+    rng = np.random.default_rng(location_seed)
+    noise_span = int(growth_rate * 0.1)
+    noise = rng.integers(-noise_span, noise_span + 1, size=len(dates))
+    tree_evolution = (base_count + np.arange(len(dates)) * growth_rate + noise).astype(int)
     
     fig_evolution = go.Figure()
-    fig_evolution.add_trace(go.Scatter(
+    fig_evolution.add_trace(go.Scattergl(
         x=dates, 
         y=tree_evolution,
         mode='lines+markers',
@@ -1287,6 +1398,7 @@ elif analysis_type == "📅 Change Detection":
     """)
 
 else:  # AI Model Status
+    import plotly.graph_objects as go
     
     st.header("🤖 AI Model Training & Performance")
     
@@ -1294,8 +1406,7 @@ else:  # AI Model Status
     model_path = "forest_model.pth"
     training_log_path = "training_history.json"
     
-    model_exists = Path(model_path).exists()
-    training_log_exists = Path(training_log_path).exists()
+    model_exists, training_log_exists = get_model_artifacts_status(model_path, training_log_path)
     
     if not model_exists:
         st.warning("⚠️ **No AI Model Found**: No trained model exists in this workspace.")
@@ -1341,13 +1452,17 @@ else:  # AI Model Status
                 for i, step in enumerate(training_steps):
                     status_text.text(step)
                     progress_bar.progress((i + 1) / len(training_steps))
-                    time.sleep(1)
+                    time.sleep(0.05)  # Keep the progress animation visible without blocking the script thread
                 
                 # Generate realistic training metrics
                 import json
+                epoch_idx = np.arange(10)
+                epoch_acc = np.round(0.6 + epoch_idx * 0.03 + np.random.uniform(-0.02, 0.02, 10), 3)
+                epoch_loss = np.round(0.8 - epoch_idx * 0.06 + np.random.uniform(-0.05, 0.03, 10), 3)
+                
                 training_metrics = {
                     "model_name": "forest_unet_v1",
-                    "training_date": datetime.now().isoformat(),
+                    "training_date": NOW.isoformat(),
                     "epochs": 10,
                     "final_accuracy": round(random.uniform(0.88, 0.94), 3),
                     "final_precision": round(random.uniform(0.85, 0.92), 3),
@@ -1358,10 +1473,8 @@ else:  # AI Model Status
                     "validation_samples": random.randint(1500, 3000),
                     "processing_time_seconds": round(random.uniform(1.8, 3.2), 1),
                     "training_history": {
-                        f"epoch_{i+1}": {
-                            "accuracy": round(0.6 + (i * 0.03) + random.uniform(-0.02, 0.02), 3),
-                            "loss": round(0.8 - (i * 0.06) + random.uniform(-0.05, 0.03), 3)
-                        } for i in range(10)
+                        f"epoch_{i+1}": {"accuracy": float(acc), "loss": float(loss)}
+                        for i, (acc, loss) in enumerate(zip(epoch_acc, epoch_loss))
                     }
                 }
                 
@@ -1371,6 +1484,7 @@ else:  # AI Model Status
                 
                 # Create a dummy model file to indicate training completed
                 Path(model_path).touch()
+                get_model_artifacts_status.clear()
                 
                 st.success("✅ **Model Training Completed!**")
                 st.info("� Refresh the page to see real model performance metrics.")
@@ -1400,8 +1514,7 @@ else:  # AI Model Status
     else:
         # Load real training metrics
         if training_log_exists:
-            with open(training_log_path, 'r') as f:
-                metrics = json.load(f)
+            metrics = load_training_metrics(training_log_path, Path(training_log_path).stat().st_mtime)
                 
             st.success("✅ **Trained Model Found**: Displaying real performance metrics from training log.")
             
@@ -1409,44 +1522,20 @@ else:  # AI Model Status
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.markdown(f"""
-                <div class="ai-metric-container">
-                    <div class="ai-metric-label">🎯 Model Accuracy</div>
-                    <div class="ai-metric-value">{metrics['final_accuracy']:.1%}</div>
-                    <div class="ai-metric-delta">Actual accuracy from validation</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(metric_card("🎯 Model Accuracy", f"{metrics['final_accuracy']:.1%}", "Actual accuracy from validation"), unsafe_allow_html=True)
             
             with col2:
-                st.markdown(f"""
-                <div class="ai-metric-container">
-                    <div class="ai-metric-label">⚡ Processing Speed</div>
-                    <div class="ai-metric-value">{metrics['processing_time_seconds']} sec</div>
-                    <div class="ai-metric-delta">Per 10km² satellite image</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(metric_card("⚡ Processing Speed", f"{metrics['processing_time_seconds']} sec", "Per 10km² satellite image"), unsafe_allow_html=True)
             
             with col3:
                 training_date = datetime.fromisoformat(metrics['training_date'])
-                days_ago = (datetime.now() - training_date).days
-                st.markdown(f"""
-                <div class="ai-metric-container">
-                    <div class="ai-metric-label">📅 Last Training</div>
-                    <div class="ai-metric-value">{days_ago} days ago</div>
-                    <div class="ai-metric-delta">Model last updated</div>
-                </div>
-                """, unsafe_allow_html=True)
+                days_ago = (NOW - training_date).days
+                st.markdown(metric_card("📅 Last Training", f"{days_ago} days ago", "Model last updated"), unsafe_allow_html=True)
             
             with col4:
                 data_quality = "Good" if metrics['final_iou'] > 0.8 else "Fair" if metrics['final_iou'] > 0.7 else "Poor"
                 quality_color = "#4ade80" if data_quality == "Good" else "#fbbf24" if data_quality == "Fair" else "#ef4444"
-                st.markdown(f"""
-                <div class="ai-metric-container">
-                    <div class="ai-metric-label">📊 Model Quality</div>
-                    <div class="ai-metric-value" style="color: {quality_color};">{data_quality}</div>
-                    <div class="ai-metric-delta">IoU score: {metrics['final_iou']:.3f}</div>
-                </div>
-                """, unsafe_allow_html=True)
+                st.markdown(metric_card("📊 Model Quality", data_quality, f"IoU score: {metrics['final_iou']:.3f}", value_color=quality_color), unsafe_allow_html=True)
             
             st.markdown("---")
             
@@ -1456,7 +1545,7 @@ else:  # AI Model Status
             with col1:
                 st.subheader("📊 Real Model Performance")
                 
-                real_metrics_df = pd.DataFrame({
+                real_metrics_df = {
                     'Metric': ['Precision', 'Recall', 'F1-Score', 'IoU'],
                     'Value': [
                         metrics['final_precision'],
@@ -1470,7 +1559,7 @@ else:  # AI Model Status
                         'Balance of precision & recall',
                         'Overlap accuracy (boundaries)'
                     ]
-                })
+                }
                 
                 st.dataframe(real_metrics_df, use_container_width=True, hide_index=True)
                 
@@ -1499,30 +1588,7 @@ else:  # AI Model Status
                     accuracies = [metrics['training_history'][f'epoch_{i}']['accuracy'] for i in epochs]
                     losses = [metrics['training_history'][f'epoch_{i}']['loss'] for i in epochs]
                     
-                    fig_history = go.Figure()
-                    fig_history.add_trace(go.Scatter(
-                        x=epochs, y=accuracies,
-                        mode='lines+markers',
-                        name='Training Accuracy',
-                        line=dict(color='#2d6a4f')
-                    ))
-                    
-                    # Add secondary y-axis for loss
-                    fig_history2 = go.Figure()
-                    fig_history2.add_trace(go.Scatter(
-                        x=epochs, y=losses,
-                        mode='lines+markers',
-                        name='Training Loss',
-                        line=dict(color='#e74c3c')
-                    ))
-                    
-                    fig_history.update_layout(
-                        title='Real Training Progress',
-                        xaxis_title='Epoch',
-                        yaxis_title='Accuracy',
-                        height=350
-                    )
-                    st.plotly_chart(fig_history, use_container_width=True)
+                    render_training_history(epochs, accuracies, losses)
                     
                 else:
                     st.info("No detailed training history available.")
@@ -1548,7 +1614,7 @@ Final IoU: {metrics['final_iou']:.3f}
 Training Samples: {metrics['training_samples']:,}
 Validation Samples: {metrics['validation_samples']:,}
 Processing Speed: {metrics['processing_time_seconds']} sec/image
-Model Size: {Path(model_path).stat().st_size if Path(model_path).exists() else 0} bytes
+Model Size: {model_file_size(model_path)} bytes
                 """)
                 
         else:
@@ -1596,106 +1662,113 @@ with col3:
     - Auto-refresh: Every 5 minutes
     """)
 
+# Report builders, memoized on the data snapshot so repeated exports reuse the result
+@st.cache_data
+def build_report_fields(data: Dict[str, Any], location: str) -> Dict[str, Any]:
+    """Compute the data-derived REPORT_TMPL fields; timestamps are filled in by build_report_text"""
+    pct = dict(zip(('healthy', 'moderate', 'stressed', 'unhealthy'), data['ratios']))
+    air_quality = data.get('air_quality', {})
+    weather = data.get('weather', {})
+    satellite_info = data.get('satellite_info', {})
+    
+    fields = {
+        'location': location,
+        'lat': data['coordinates'][0],
+        'lon': data['coordinates'][1],
+        'tree_count': data['tree_count'],
+        'tree_area_ha': data['tree_area_ha'],
+        'forest_coverage': data.get('forest_coverage', 'N/A'),
+        'carbon_tons': data['carbon_tons'],
+        'healthy_trees': data['healthy_trees'],
+        'moderate_trees': data['moderate_trees'],
+        'stressed_trees': data['stressed_trees'],
+        'unhealthy_trees': data['unhealthy_trees'],
+        'healthy_pct': pct['healthy'],
+        'moderate_pct': pct['moderate'],
+        'stressed_pct': pct['stressed'],
+        'unhealthy_pct': pct['unhealthy'],
+        'ndvi_mean': data['ndvi_mean'],
+        'pm25': air_quality.get('pm25', 'N/A'),
+        'pm10': air_quality.get('pm10', 'N/A'),
+        'aqi': air_quality.get('aqi', 'N/A'),
+        'temperature_c': weather.get('temperature_c', 'N/A'),
+        'humidity_percent': weather.get('humidity_percent', 'N/A'),
+        'wind_speed_kmh': weather.get('wind_speed_kmh', 'N/A'),
+        'cloud_cover': satellite_info.get('cloud_cover', 'N/A'),
+        'last_capture': satellite_info.get('last_capture', 'N/A'),
+        'resolution_m': satellite_info.get('resolution_m', 'N/A'),
+        'trees_per_ha': int(data['tree_count']/data['tree_area_ha']) if data['tree_area_ha'] > 0 else 'N/A',
+        'carbon_per_tree': data['carbon_tons']/data['tree_count']*1000,
+        'health_score': float(np.dot([1.0, 0.7, 0.4, 0.1], data['ratios']))
+    }
+    return fields
+
+def build_report_text(data: Dict[str, Any], location: str) -> str:
+    """Build the plain-text forest intelligence report, stamped with the current time"""
+    generated_at = datetime.now()
+    return REPORT_TMPL.format_map({
+        **build_report_fields(data, location),
+        'generated': generated_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'report_id': generated_at.strftime('%Y%m%d%H%M%S')
+    })
+
+def build_export_row(data: Dict[str, Any], location: str) -> Dict[str, Any]:
+    """Flatten the live data into the one-row export payload"""
+    return {
+        'timestamp': data['last_updated'],
+        'location': location,
+        'tree_count': data['tree_count'],
+        'tree_area_ha': data['tree_area_ha'],
+        'carbon_tons_per_year': data['carbon_tons'],
+        'healthy_trees': data['healthy_trees'],
+        'moderate_trees': data['moderate_trees'],
+        'stressed_trees': data['stressed_trees'],
+        'unhealthy_trees': data['unhealthy_trees'],
+        'ndvi_mean': data['ndvi_mean'],
+        'pm25': data.get('air_quality', {}).get('pm25', None),
+        'temperature_c': data.get('weather', {}).get('temperature_c', None),
+        'cloud_cover_percent': data.get('satellite_info', {}).get('cloud_cover', None)
+    }
+
+@st.cache_data
+def build_export_csv(last_updated: str, row: Dict[str, Any]) -> bytes:
+    """Encode the export row as CSV bytes, memoized per data snapshot"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(row.keys())
+    writer.writerow(row.values())
+    return buffer.getvalue().encode('utf-8')
+
 # Export functionality
 st.sidebar.markdown("---")
 st.sidebar.subheader("📥 Export & Reports")
 
 # Show data freshness
-data_age = datetime.now() - datetime.strptime(data['last_updated'], '%Y-%m-%d %H:%M:%S')
+data_age = NOW - datetime.strptime(data['last_updated'], '%Y-%m-%d %H:%M:%S')
 freshness_color = "🟢" if data_age.seconds < 600 else "🟡" if data_age.seconds < 3600 else "🔴"
 st.sidebar.info(f"{freshness_color} Data age: {data_age.seconds//60} minutes")
 
 if st.sidebar.button("📄 Generate PDF Report"):
     with st.spinner("Generating report..."):
-        time.sleep(2)  # Simulate report generation
+        report_data = build_report_text(data, location)
     st.sidebar.success("✅ Report generated!")
     
-    # Create detailed report data
-    report_data = f"""EcoMind Forest Intelligence Report
-{'='*50}
-
-Location: {location}
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-Coordinates: {data['coordinates'][0]:.4f}, {data['coordinates'][1]:.4f}
-
-FOREST METRICS
-{'='*20}
-Total Trees: {data['tree_count']:,}
-Forest Area: {data['tree_area_ha']:.1f} hectares
-Forest Coverage: {data.get('forest_coverage', 'N/A')}%
-Carbon Sequestration: {data['carbon_tons']:.1f} tons/year
-
-TREE HEALTH DISTRIBUTION
-{'='*25}
-Healthy Trees: {data['healthy_trees']:,} ({data['healthy_trees']/data['tree_count']*100:.1f}%)
-Moderate Condition: {data['moderate_trees']:,} ({data['moderate_trees']/data['tree_count']*100:.1f}%)
-Stressed Trees: {data['stressed_trees']:,} ({data['stressed_trees']/data['tree_count']*100:.1f}%)
-Unhealthy Trees: {data['unhealthy_trees']:,} ({data['unhealthy_trees']/data['tree_count']*100:.1f}%)
-
-ENVIRONMENTAL CONDITIONS
-{'='*24}
-NDVI Index: {data['ndvi_mean']:.3f}
-Air Quality (PM2.5): {data.get('air_quality', {}).get('pm25', 'N/A')} µg/m³
-Air Quality (PM10): {data.get('air_quality', {}).get('pm10', 'N/A')} µg/m³
-AQI: {data.get('air_quality', {}).get('aqi', 'N/A')}
-Temperature: {data.get('weather', {}).get('temperature_c', 'N/A')}°C
-Humidity: {data.get('weather', {}).get('humidity_percent', 'N/A')}%
-Wind Speed: {data.get('weather', {}).get('wind_speed_kmh', 'N/A')} km/h
-
-SATELLITE DATA
-{'='*14}
-Cloud Cover: {data.get('satellite_info', {}).get('cloud_cover', 'N/A')}%
-Last Capture: {data.get('satellite_info', {}).get('last_capture', 'N/A')}
-Resolution: {data.get('satellite_info', {}).get('resolution_m', 'N/A')}m
-
-ANALYSIS SUMMARY
-{'='*16}
-This report provides a comprehensive assessment of urban forest 
-conditions in {location}. The data is collected from multiple 
-sources including satellite imagery, environmental sensors, and 
-field monitoring systems.
-
-Trees per Hectare: {int(data['tree_count']/data['tree_area_ha']) if data['tree_area_ha'] > 0 else 'N/A'}
-Carbon per Tree: {data['carbon_tons']/data['tree_count']*1000:.1f} kg/tree/year
-Health Score: {(data['healthy_trees']*1.0 + data['moderate_trees']*0.7 + data['stressed_trees']*0.4 + data['unhealthy_trees']*0.1)/data['tree_count']*100:.1f}/100
-
-Generated by EcoMind - Urban Forest Intelligence System
-Report ID: ECM-{datetime.now().strftime('%Y%m%d%H%M%S')}
-"""
-    
     st.sidebar.download_button(
         label="⬇️ Download Report (TXT)",
         data=report_data,
-        file_name=f"ecomind_report_{location.replace(' ', '_').replace(',', '')}_{datetime.now().strftime('%Y%m%d_%H%M')}.txt",
+        file_name=f"ecomind_report_{location.replace(' ', '_').replace(',', '')}_{NOW.strftime('%Y%m%d_%H%M')}.txt",
         mime="text/plain",
         help="Download detailed text report"
     )
 
 if st.sidebar.button("📊 Export Live Data"):
     with st.spinner("Exporting data..."):
-        time.sleep(1)  # Simulate data export
-    
-    # Create comprehensive CSV data
-    export_data = pd.DataFrame({
-        'timestamp': [data['last_updated']],
-        'location': [location],
-        'tree_count': [data['tree_count']],
-        'tree_area_ha': [data['tree_area_ha']],
-        'carbon_tons_per_year': [data['carbon_tons']],
-        'healthy_trees': [data['healthy_trees']],
-        'moderate_trees': [data['moderate_trees']],
-        'stressed_trees': [data['stressed_trees']],
-        'unhealthy_trees': [data['unhealthy_trees']],
-        'ndvi_mean': [data['ndvi_mean']],
-        'pm25': [data.get('air_quality', {}).get('pm25', None)],
-        'temperature_c': [data.get('weather', {}).get('temperature_c', None)],
-        'cloud_cover_percent': [data.get('satellite_info', {}).get('cloud_cover', None)]
-    })
+        export_data = build_export_csv(data['last_updated'], build_export_row(data, location))
     
     st.sidebar.download_button(
         label="⬇️ Download CSV",
-        data=export_data.to_csv(index=False),
-        file_name=f"ecomind_live_data_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
+        data=export_data,
+        file_name=f"ecomind_live_data_{NOW.strftime('%Y%m%d_%H%M')}.csv",
         mime="text/csv"
     )
 st.sidebar.markdown("---")
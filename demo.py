@@ -4,7 +4,7 @@ Showcasing key functionality without requiring authentication
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw
 from pathlib import Path
 import sys
 import os
@@ -12,26 +12,37 @@ import os
 # Add the current directory to Python path
 sys.path.append(os.getcwd())
 
+# RdYlGn colormap as a 256-entry RGB lookup table (ColorBrewer stops), built once at import
+_RDYLGN_STOPS = np.array([
+    (165, 0, 38), (215, 48, 39), (244, 109, 67), (253, 174, 97), (254, 224, 139),
+    (255, 255, 191), (217, 239, 139), (166, 217, 106), (102, 189, 99), (26, 152, 80), (0, 104, 55)
+], dtype=np.float32)
+_NDVI_LUT = np.stack([
+    np.interp(np.linspace(0, 1, 256), np.linspace(0, 1, len(_RDYLGN_STOPS)), _RDYLGN_STOPS[:, c])
+    for c in range(3)
+], axis=1).astype(np.uint8)
+
 def create_synthetic_data():
     """Create synthetic satellite data for demonstration."""
     print("📡 Creating synthetic satellite data for demonstration...")
     
     # Create synthetic 6-band satellite image (256x256)
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     height, width = 256, 256
     bands = 6
     
     # Simulate different land cover types
-    image = np.random.rand(bands, height, width) * 5000  # Simulate digital numbers
+    image = rng.random((bands, height, width), dtype=np.float32)
+    image *= 5000.0  # Simulate digital numbers
     
     # Add some structure to make it look more realistic
     # Simulate vegetation areas with higher NIR (band 4)
-    vegetation_mask = np.zeros((height, width))
+    vegetation_mask = np.zeros((height, width), dtype=np.uint8)
     vegetation_mask[50:150, 50:150] = 1  # Square vegetation area
     vegetation_mask[100:200, 100:200] = 1  # Overlapping area
     
     # Enhance NIR band in vegetation areas
-    image[3] = image[3] + vegetation_mask * 3000
+    image[3] += vegetation_mask * np.float32(3000)
     
     # Create corresponding tree mask
     tree_mask = (vegetation_mask > 0).astype(np.uint8)
@@ -42,13 +53,18 @@ def demonstrate_ndvi_calculation(image):
     """Demonstrate NDVI calculation."""
     print("\n🌿 Calculating NDVI...")
     
-    # Extract red (band 3) and NIR (band 4) - using 0-based indexing
-    red = image[2] / 10000.0  # B3 (red)
-    nir = image[3] / 10000.0  # B4 (NIR)
+    # Extract red (band 3) and NIR (band 4) - using 0-based indexing, scaled straight into float32
+    red = np.multiply(image[2], 1e-4, dtype=np.float32)  # B3 (red)
+    nir = np.multiply(image[3], 1e-4, dtype=np.float32)  # B4 (NIR)
     
-    # Calculate NDVI
-    ndvi = (nir - red) / (nir + red + 1e-8)
-    ndvi = np.clip(ndvi, -1, 1)
+    # Calculate NDVI in preallocated buffers
+    ndvi = np.empty_like(red)
+    den = np.empty_like(red)
+    np.subtract(nir, red, out=ndvi)
+    np.add(nir, red, out=den)
+    den += 1e-8
+    np.divide(ndvi, den, out=ndvi)
+    np.clip(ndvi, -1, 1, out=ndvi)
     
     print(f"NDVI range: {ndvi.min():.3f} to {ndvi.max():.3f}")
     print(f"Mean NDVI: {ndvi.mean():.3f}")
@@ -59,17 +75,16 @@ def demonstrate_health_assessment(tree_mask, ndvi):
     """Demonstrate tree health assessment."""
     print("\n🏥 Assessing tree health...")
     
-    healthy = (ndvi > 0.6) & (tree_mask > 0)
-    moderate = (ndvi > 0.4) & (ndvi <= 0.6) & (tree_mask > 0)
-    stressed = (ndvi > 0.2) & (ndvi <= 0.4) & (tree_mask > 0)
-    unhealthy = (ndvi <= 0.2) & (tree_mask > 0)
+    # Bin NDVI in one pass: 0 = <=0.2, 1 = (0.2, 0.4], 2 = (0.4, 0.6], 3 = >0.6
+    bins = np.digitize(ndvi, [0.2, 0.4, 0.6], right=True).astype(np.uint8)
+    counts = np.bincount(bins[tree_mask.astype(bool)], minlength=4)
     
     health_stats = {
-        'healthy': int(np.sum(healthy)),
-        'moderate': int(np.sum(moderate)),
-        'stressed': int(np.sum(stressed)),
-        'unhealthy': int(np.sum(unhealthy)),
-        'total_pixels': int(np.sum(tree_mask > 0))
+        'healthy': int(counts[3]),
+        'moderate': int(counts[2]),
+        'stressed': int(counts[1]),
+        'unhealthy': int(counts[0]),
+        'total_pixels': int(counts.sum())
     }
     
     print("Tree Health Distribution:")
@@ -85,7 +100,7 @@ def demonstrate_carbon_estimation(tree_mask, resolution=10):
     print("\n💨 Estimating carbon capture...")
     
     # Calculate tree area
-    tree_area_pixels = np.sum(tree_mask > 0)
+    tree_area_pixels = int(tree_mask.sum(dtype=np.int64))  # mask is already 0/1 uint8
     tree_area_m2 = tree_area_pixels * (resolution ** 2)
     tree_area_ha = tree_area_m2 / 10000
     
@@ -112,25 +127,26 @@ def create_visualization(image, tree_mask, ndvi, health_stats):
     print("\n📊 Creating visualizations...")
     
     try:
-        fig, axes = plt.subplots(2, 2, figsize=(12, 10))
+        tile = 256
+        canvas = Image.new('RGB', (2 * tile, 2 * tile), 'white')
+        draw = ImageDraw.Draw(canvas)
         
         # RGB composite (using bands 2, 1, 0 as RGB)
-        rgb = image[:3].transpose(1, 2, 0)
-        rgb = np.clip(rgb / 3000, 0, 1)  # Normalize for display
-        axes[0, 0].imshow(rgb)
-        axes[0, 0].set_title('RGB Composite')
-        axes[0, 0].axis('off')
+        # Scale to 8-bit in a single float32 buffer, then view it as HWC
+        rgb_buf = np.empty(image[:3].shape, dtype=np.float32)
+        np.multiply(image[:3], np.float32(255 / 3000), out=rgb_buf)
+        np.clip(rgb_buf, 0, 255, out=rgb_buf)
+        rgb = np.moveaxis(rgb_buf, 0, -1).astype(np.uint8)
+        canvas.paste(Image.fromarray(rgb).resize((tile, tile)), (0, 0))
         
-        # Tree mask
-        axes[0, 1].imshow(tree_mask, cmap='Greens')
-        axes[0, 1].set_title('Tree Mask')
-        axes[0, 1].axis('off')
+        # Tree mask tinted green on white
+        mask_rgb = np.full(tree_mask.shape + (3,), 255, dtype=np.uint8)
+        mask_rgb[tree_mask.astype(bool)] = (45, 106, 79)
+        canvas.paste(Image.fromarray(mask_rgb).resize((tile, tile)), (tile, 0))
         
-        # NDVI
-        im = axes[1, 0].imshow(ndvi, cmap='RdYlGn', vmin=-1, vmax=1)
-        axes[1, 0].set_title('NDVI')
-        axes[1, 0].axis('off')
-        plt.colorbar(im, ax=axes[1, 0], fraction=0.046, pad=0.04)
+        # NDVI through the shared RdYlGn lookup table: one gather per pixel
+        idx = np.clip((ndvi + 1) * 127.5, 0, 255).astype(np.uint8)
+        canvas.paste(Image.fromarray(_NDVI_LUT[idx]).resize((tile, tile)), (0, tile))
         
         # Health distribution
         categories = ['Healthy', 'Moderate', 'Stressed', 'Unhealthy']
@@ -138,29 +154,30 @@ def create_visualization(image, tree_mask, ndvi, health_stats):
                  health_stats['stressed'], health_stats['unhealthy']]
         colors = ['#2d6a4f', '#52b788', '#ffc107', '#dc3545']
         
-        bars = axes[1, 1].bar(categories, values, color=colors)
-        axes[1, 1].set_title('Tree Health Distribution')
-        axes[1, 1].set_ylabel('Number of Pixels')
+        origin_x, base_y = tile + 16, 2 * tile - 24
+        bar_width, max_height = 48, tile - 72
+        
+        # Bar geometry for all four bars at once
+        counts = np.asarray(values, dtype=np.int64)
+        lefts = origin_x + np.arange(len(counts)) * (bar_width + 10)
+        tops = base_y - (counts * max_height) // max(int(counts.max()), 1)
         
-        # Add value labels on bars
-        for bar, value in zip(bars, values):
+        for category, value, color, x0, top in zip(categories, values, colors, lefts.tolist(), tops.tolist()):
+            draw.rectangle([x0, top, x0 + bar_width, base_y], fill=color)
+            draw.text((x0, base_y + 4), category, fill='black')
             if value > 0:
-                axes[1, 1].text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(values)*0.01,
-                               f'{value}', ha='center', va='bottom')
+                draw.text((x0 + 2, top - 14), f'{value}', fill='black')
         
-        plt.tight_layout()
+        # Panel titles
+        for (x, y), title in zip([(0, 0), (tile, 0), (0, tile), (tile, tile)],
+                                 ['RGB Composite', 'Tree Mask', 'NDVI', 'Tree Health Distribution']):
+            draw.text((x + 6, y + 6), title, fill='black')
         
-        # Save the plot
+        # Save the composite
         output_path = 'ecomind_demo_results.png'
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
+        canvas.save(output_path, optimize=True)
         print(f"Visualization saved as: {output_path}")
         
-        # Try to show the plot (will work if in interactive environment)
-        try:
-            plt.show()
-        except:
-            print("Note: Plot display not available in this environment, but saved to file.")
-        
     except Exception as e:
         print(f"Visualization error: {e}")
         print("Continuing without visualization...")
@@ -6,15 +6,16 @@ Run this to install dependencies and test the satellite data integration
 import subprocess
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 def run_command(command, description):
-    """Run a command and handle errors"""
+    """Run a command (argument list, no shell) and handle errors"""
     print(f"\n🔧 {description}")
-    print(f"   Command: {command}")
+    print(f"   Command: {' '.join(command)}")
     
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
         print(f"   ✅ Success!")
         if result.stdout:
             print(f"   Output: {result.stdout.strip()}")
@@ -25,25 +26,43 @@ def run_command(command, description):
             print(f"   Error: {e.stderr.strip()}")
         return False
 
-def check_python_packages():
+# pip distribution name -> importable module name
+REQUIRED_PACKAGES = {
+    'earthengine-api': 'ee',
+    'google-auth': 'google.auth',
+    'google-auth-oauthlib': 'google_auth_oauthlib',
+    'fastapi': 'fastapi',
+    'uvicorn': 'uvicorn'
+}
+
+def _probe_module(module, full=False):
+    """Return 'ok', 'missing' or 'failed'; locate only unless full, which really imports it"""
+    try:
+        if not full:
+            return 'ok' if importlib.util.find_spec(module) is not None else 'missing'
+        importlib.import_module(module)
+        return 'ok'
+    except ImportError:
+        return 'missing'
+    except Exception:
+        # Installed but broken (e.g. a bad C extension); not something pip install fixes
+        return 'failed'
+
+def check_python_packages(full=False):
     """Check if required packages are installed"""
     print("\n📦 Checking Python packages...")
     
-    required_packages = [
-        'earthengine-api',
-        'google-auth',
-        'google-auth-oauthlib',
-        'fastapi',
-        'uvicorn'
-    ]
-    
     missing_packages = []
     
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
+    # find_spec only locates the modules, so the default check stays fast without importing;
+    # with --full the imports run one at a time to avoid concurrent first-import races
+    for package, module in REQUIRED_PACKAGES.items():
+        status = _probe_module(module, full)
+        if status == 'ok':
             print(f"   ✅ {package}")
-        except ImportError:
+        elif status == 'failed':
+            print(f"   ⚠️ {package} - import failed")
+        else:
             print(f"   ❌ {package} - MISSING")
             missing_packages.append(package)
     
@@ -53,9 +72,9 @@ def install_packages():
     """Install required packages"""
     print("\n🚀 Installing EcoMind satellite data dependencies...")
     
-    # Install from requirements
+    # Install everything in one pip invocation to pay interpreter and resolver startup once
     success = run_command(
-        "pip install -r api_requirements.txt",
+        [sys.executable, '-m', 'pip', 'install', '-r', 'api_requirements.txt'],
         "Installing packages from api_requirements.txt"
     )
     
@@ -98,10 +117,17 @@ def test_satellite_module():
         print(f"   ⚠️ Satellite module imported but Earth Engine not authenticated: {e}")
         return False
 
-def test_api_endpoints():
-    """Test the new API endpoints"""
+def test_api_endpoints(full=False):
+    """Test the new API endpoints (locate only unless full, importing pulls in the whole stack)"""
     print("\n🔌 Testing API endpoints...")
     
+    if not full:
+        if importlib.util.find_spec('api_server') is None:
+            print("   ❌ API server module not found")
+            return False
+        print("   ✅ API server module found (run with --full to import it)")
+        return True
+    
     try:
         # Import the modified API server
         from api_server import app
@@ -141,8 +167,10 @@ def main():
         print("❌ Please run this script from the EcoMind project directory")
         return
     
+    full = '--full' in sys.argv[1:]
+    
     # Check packages
-    missing_packages = check_python_packages()
+    missing_packages = check_python_packages(full)
     
     if missing_packages:
         print(f"\n📦 Missing packages: {missing_packages}")
@@ -160,7 +188,7 @@ def main():
     satellite_available = test_satellite_module()
     
     # Test API
-    if not test_api_endpoints():
+    if not test_api_endpoints(full=full):
         return
     
     print("\n🎉 EcoMind Satellite Integration Setup Complete!")
@@ -9,10 +9,214 @@ from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime, timedelta
 import logging
 import time
+import math
+import os
+import zlib
 import json
+import threading
+import io
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
+# High-volume endpoint: meant for many concurrent automated requests. Like the standard
+# endpoint, each interactive response (getInfo, computePixels, ...) is capped at 32 MB,
+# which the per-city statistics dictionaries stay far below.
+EE_HIGHVOLUME_URL = 'https://earthengine-highvolume.googleapis.com'
+
+# Composites with a smaller share of clear pixels are not worth reducing
+MIN_VALID_FRACTION = 0.2
+
+# Scenes covering less than this share of the ROI are left out of the composite
+MIN_ROI_COVERAGE = 0.05
+
+# Opt-in asynchronous path: ROIs larger than this are reduced by an Earth Engine export task
+# writing to the bucket instead of a synchronous getInfo (only when a bucket is configured)
+EXPORT_BUCKET = os.environ.get('ECOMIND_EXPORT_BUCKET')
+EXPORT_MIN_AREA_KM2 = float(os.environ.get('ECOMIND_EXPORT_MIN_AREA_KM2', 100))
+
+# Client-side cap on in-flight getInfo calls, and the retry schedule for throttled ones
+EE_MAX_CONCURRENT = 64
+EE_MAX_ATTEMPTS = 5
+EE_BACKOFF_MAX = 60.0  # seconds
+_EE_SEMAPHORE = threading.BoundedSemaphore(EE_MAX_CONCURRENT)
+_EE_THROTTLE_MARKERS = ('429', 'too many', 'rate limit', 'quota', 'concurrent')
+
+def _get_info(obj) -> Any:
+    """getInfo() under the concurrency cap, retrying throttled requests with exponential backoff"""
+    for attempt in range(EE_MAX_ATTEMPTS):
+        try:
+            with _EE_SEMAPHORE:
+                return obj.getInfo()
+        except ee.EEException as e:
+            message = str(e).lower()
+            if attempt == EE_MAX_ATTEMPTS - 1 or not any(m in message for m in _EE_THROTTLE_MARKERS):
+                raise
+            delay = min(EE_BACKOFF_MAX, 2.0 ** attempt)
+            logger.warning(f"Earth Engine throttled the request, retrying in {delay:.0f}s: {e}")
+            time.sleep(delay)
+
+# Per-city satellite summaries, keyed by _summary_cache_key so entries expire hourly
+_SummaryKey = Tuple[str, int, int, Optional[Tuple[float, ...]], bool, str]
+_SUMMARY_CACHE: Dict[_SummaryKey, Dict[str, Any]] = {}
+_SUMMARY_CACHE_MAXSIZE = 512
+_SUMMARY_CACHE_LOCK = threading.Lock()
+
+
+def _summary_cache_key(city_name: str, days_back: int, scale: int,
+                       bbox: Optional[Tuple[float, ...]], local_stats: bool) -> _SummaryKey:
+    """Build the (city, days_back, scale, bbox, local_stats, UTC hour) key for _SUMMARY_CACHE"""
+    return (city_name.lower().strip(), days_back, scale, bbox, local_stats,
+            time.strftime('%Y-%m-%d-%H', time.gmtime()))
+
+# Masked collections keyed by ((lat, lon, buffer_km) or bbox, start, end). Scenes are immutable, so an
+# identical graph is reused and Earth Engine can serve the masking from its own result cache.
+_MASK_CACHE: Dict[Tuple[Tuple[float, ...], str, str], ee.ImageCollection] = {}
+_MASK_CACHE_MAXSIZE = 256
+_MASK_CACHE_LOCK = threading.Lock()
+
+# Expanded coordinate database, keyed by lowercase city name
+_CITY_COORDS: Dict[str, Tuple[float, float]] = {
+    # India - Major Cities
+    "mumbai": (19.0760, 72.8777),
+    "delhi": (28.7041, 77.1025), 
+    "bangalore": (12.9716, 77.5946),
+    "chennai": (13.0827, 80.2707),
+    "kolkata": (22.5726, 88.3639),
+    "hyderabad": (17.3850, 78.4867),
+    "pune": (18.5204, 73.8567),
+    "ahmedabad": (23.0225, 72.5714),
+    "jaipur": (26.9124, 75.7873),
+    "kakinada": (16.9891, 82.2475),
+    "visakhapatnam": (17.6868, 83.2185),
+    "vijayawada": (16.5062, 80.6480),
+    "guntur": (16.3067, 80.4365),
+    "tirupati": (13.6288, 79.4192),
+    "kochi": (9.9312, 76.2673),
+    "trivandrum": (8.5241, 76.9366),
+    
+    # International
+    "new york": (40.7128, -74.0060),
+    "london": (51.5074, -0.1278),
+    "paris": (48.8566, 2.3522),
+    "berlin": (52.5200, 13.4050),
+    "tokyo": (35.6762, 139.6503),
+    "beijing": (39.9042, 116.4074),
+    "sydney": (-33.8688, 151.2093),
+    "sao paulo": (-23.5505, -46.6333),
+}
+
+# City size factors for the synthetic fallback, keyed by lowercase city name
+_POP_FACTORS: Dict[str, float] = {
+    'mumbai': 1.0, 'delhi': 0.9, 'bangalore': 0.7, 'chennai': 0.6,
+    'kolkata': 0.8, 'hyderabad': 0.65, 'pune': 0.5, 'ahmedabad': 0.4,
+    'jaipur': 0.3, 'lucknow': 0.25, 'kanpur': 0.2, 'nagpur': 0.15
+}
+
+
+def _match_city(city_lower: str, table: Dict[str, Any]) -> Optional[Any]:
+    """Look up a normalized city name: exact hit, then word spans longest first ("new delhi" -> delhi)"""
+    value = table.get(city_lower)
+    if value is not None:
+        return value
+    
+    tokens = city_lower.split()
+    for width in range(len(tokens) - 1, 0, -1):
+        for start in range(len(tokens) - width + 1):
+            value = table.get(' '.join(tokens[start:start + width]))
+            if value is not None:
+                return value
+    return None
+
+
+@lru_cache(maxsize=2048)
+def _lookup_city_coordinates(city_lower: str) -> Tuple[float, float]:
+    """Resolve a normalized city name to coordinates (memoized)"""
+    coords = _match_city(city_lower, _CITY_COORDS)
+    if coords is not None:
+        return coords
+    
+    # Partial match (e.g. a prefix such as "bang"), only reached on a first-time miss
+    for city, coords in _CITY_COORDS.items():
+        if city in city_lower or city_lower in city:
+            return coords
+    
+    # Default to Kakinada (our reference location)
+    logger.warning(f"Coordinates not found for {city_lower}, using default location")
+    return (16.9891, 82.2475)
+
+
+@lru_cache(maxsize=2048)
+def _lookup_population_factor(city_lower: str) -> float:
+    """Resolve a normalized city name to its synthetic size factor (memoized)"""
+    factor = _match_city(city_lower, _POP_FACTORS)
+    if factor is not None:
+        return factor
+    
+    # Substring fallback for names glued to other text, only reached on a first-time miss
+    for major_city, factor in _POP_FACTORS.items():
+        if major_city in city_lower:
+            return factor
+    return 0.1
+
+
+# NDVI -> forest coverage: > 0.5 is 70%, > 0.3 is 40%, > 0.2 is 20%, otherwise 5%
+_NDVI_EDGES = np.array([0.2, 0.3, 0.5])
+_COVERAGE = np.array([0.05, 0.2, 0.4, 0.7])
+
+# Health level needs both indices above a rung's thresholds (level 3 = NDVI > 0.6 and EVI > 0.4)
+_HEALTH_NDVI_EDGES = np.array([0.2, 0.4, 0.6])
+_HEALTH_EVI_EDGES = np.array([0.1, 0.2, 0.4])
+
+# Rows are health levels 0-3, columns the healthy/moderate/stressed/unhealthy shares
+_HEALTH_TABLE = np.array([
+    [0.15, 0.25, 0.35, 0.25],
+    [0.30, 0.30, 0.25, 0.15],
+    [0.50, 0.30, 0.15, 0.05],
+    [0.70, 0.20, 0.08, 0.02]
+])
+
+
+# Carbon sequestration rate (tons CO2/ha/year) for each health category
+_CARBON_RATES = np.array([6.5, 4.0, 2.0, 0.75])
+
+
+def classify_indices(ndvi_means, evi_means) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (forest coverage fraction, health level 0-3) per city on the exact float thresholds"""
+    coverage = _COVERAGE[np.searchsorted(_NDVI_EDGES, ndvi_means)]
+    levels = np.minimum(np.searchsorted(_HEALTH_NDVI_EDGES, ndvi_means),
+                        np.searchsorted(_HEALTH_EVI_EDGES, evi_means))
+    return coverage, levels
+
+
+def vegetation_stats_from_bands(blue: np.ndarray, red: np.ndarray, nir: np.ndarray) -> Dict[str, float]:
+    """Compute NDVI/EVI/SAVI statistics locally, keyed like the Earth Engine reducer output"""
+    blue, red, nir = (np.asarray(b, dtype=np.float32) for b in (blue, red, nir))
+    
+    # Masked pixels come back as 0 in downloads; treat them as missing
+    valid = (red > 0) | (nir > 0)
+    diff = nir - red
+    total = nir + red
+    indices = {
+        'NDVI': diff / (total + np.float32(1e-9)),
+        'EVI': 2.5 * diff / (nir + 6 * red - 7.5 * blue + 1),
+        'SAVI': diff / (total + np.float32(0.5)) * np.float32(1.5)
+    }
+    
+    stats = {}
+    for name, values in indices.items():
+        values = np.where(valid & np.isfinite(values), values, np.nan)
+        if np.isnan(values).all():
+            continue
+        stats[f'{name}_mean'] = float(np.nanmean(values))
+        stats[f'{name}_p0'] = float(np.nanmin(values))
+        stats[f'{name}_p100'] = float(np.nanmax(values))
+        stats[f'{name}_stdDev'] = float(np.nanstd(values))
+    return stats
+
+
 class SentinelDataFetcher:
     """Fetches real satellite data from Copernicus Sentinel-2 SR Harmonized dataset"""
     
@@ -22,10 +226,13 @@ class SentinelDataFetcher:
         self.initialize_earth_engine()
     
     def initialize_earth_engine(self):
-        """Initialize and authenticate Google Earth Engine"""
+        """Initialize and authenticate Google Earth Engine (no-op once authenticated)"""
+        if self.authenticated:
+            return
+        
         try:
             # Try to initialize Earth Engine
-            ee.Initialize()
+            ee.Initialize(opt_url=EE_HIGHVOLUME_URL)
             self.authenticated = True
             logger.info("Google Earth Engine initialized successfully")
         except Exception as e:
@@ -35,51 +242,7 @@ class SentinelDataFetcher:
     
     def get_coordinates_for_city(self, city_name: str) -> Tuple[float, float]:
         """Get approximate coordinates for a city"""
-        # Expanded coordinate database
-        city_coordinates = {
-            # India - Major Cities
-            "mumbai": [19.0760, 72.8777],
-            "delhi": [28.7041, 77.1025], 
-            "bangalore": [12.9716, 77.5946],
-            "chennai": [13.0827, 80.2707],
-            "kolkata": [22.5726, 88.3639],
-            "hyderabad": [17.3850, 78.4867],
-            "pune": [18.5204, 73.8567],
-            "ahmedabad": [23.0225, 72.5714],
-            "jaipur": [26.9124, 75.7873],
-            "kakinada": [16.9891, 82.2475],
-            "visakhapatnam": [17.6868, 83.2185],
-            "vijayawada": [16.5062, 80.6480],
-            "guntur": [16.3067, 80.4365],
-            "tirupati": [13.6288, 79.4192],
-            "kochi": [9.9312, 76.2673],
-            "trivandrum": [8.5241, 76.9366],
-            
-            # International
-            "new york": [40.7128, -74.0060],
-            "london": [51.5074, -0.1278],
-            "paris": [48.8566, 2.3522],
-            "berlin": [52.5200, 13.4050],
-            "tokyo": [35.6762, 139.6503],
-            "beijing": [39.9042, 116.4074],
-            "sydney": [-33.8688, 151.2093],
-            "sao paulo": [-23.5505, -46.6333],
-        }
-        
-        city_lower = city_name.lower().strip()
-        
-        # Direct match
-        if city_lower in city_coordinates:
-            return city_coordinates[city_lower]
-        
-        # Partial match
-        for city, coords in city_coordinates.items():
-            if city in city_lower or city_lower in city:
-                return coords
-        
-        # Default to Kakinada (our reference location)
-        logger.warning(f"Coordinates not found for {city_name}, using default location")
-        return [16.9891, 82.2475]
+        return _lookup_city_coordinates(city_name.lower().strip())
     
     def create_roi_from_coordinates(self, lat: float, lon: float, buffer_km: float = 5.0) -> ee.Geometry:
         """Create Region of Interest around coordinates"""
@@ -99,135 +262,306 @@ class SentinelDataFetcher:
     
     def mask_clouds_and_shadows(self, image: ee.Image) -> ee.Image:
         """Advanced cloud and shadow masking for Sentinel-2"""
-        # Scene Classification Layer (SCL) band
-        scl = image.select('SCL')
+        # Scene Classification Layer (SCL): vegetation, not vegetated, water, snow -> 1, everything else -> 0
+        clear_pixels = image.select('SCL').remap([4, 5, 6, 11], [1, 1, 1, 1], 0)
         
-        # Create mask for clear pixels
-        clear_pixels = scl.eq(4).Or(scl.eq(5)).Or(scl.eq(6)).Or(scl.eq(11))  # Vegetation, not vegetated, water, snow
+        # Cloud probability band ships with every S2_SR_HARMONIZED scene
+        cloud_ok = image.select('MSK_CLDPRB').lt(20)  # Less than 20% cloud probability
         
-        # Additional cloud probability masking if available
-        if 'MSK_CLDPRB' in image.bandNames().getInfo():
-            cloud_prob = image.select('MSK_CLDPRB')
-            clear_pixels = clear_pixels.And(cloud_prob.lt(20))  # Less than 20% cloud probability
-        
-        return image.updateMask(clear_pixels)
+        return image.updateMask(clear_pixels.And(cloud_ok))
     
     def calculate_vegetation_indices(self, image: ee.Image) -> ee.Image:
         """Calculate vegetation indices from Sentinel-2 bands"""
+        # Work in float so the divisions never truncate the integer reflectance bands
+        nir = image.select('B8').toFloat()
+        red = image.select('B4').toFloat()
+        blue = image.select('B2').toFloat()
+        
+        # NIR - RED is shared by all three indices, so it is built once in the graph
+        diff = nir.subtract(red)
+        nir_plus_red = nir.add(red)
+        
         # NDVI (Normalized Difference Vegetation Index)
-        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-        
-        # EVI (Enhanced Vegetation Index)
-        evi = image.expression(
-            '2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))',
-            {
-                'NIR': image.select('B8'),
-                'RED': image.select('B4'),
-                'BLUE': image.select('B2')
-            }
+        ndvi = diff.divide(nir_plus_red).rename('NDVI')
+        
+        # EVI (Enhanced Vegetation Index): 2.5 * (NIR - RED) / (NIR + 6*RED - 7.5*BLUE + 1)
+        evi = diff.multiply(2.5).divide(
+            nir.add(red.multiply(6)).subtract(blue.multiply(7.5)).add(1)
         ).rename('EVI')
         
-        # SAVI (Soil Adjusted Vegetation Index)
-        savi = image.expression(
-            '((NIR - RED) / (NIR + RED + 0.5)) * 1.5',
-            {
-                'NIR': image.select('B8'),
-                'RED': image.select('B4')
-            }
-        ).rename('SAVI')
+        # SAVI (Soil Adjusted Vegetation Index): (NIR - RED) / (NIR + RED + 0.5) * 1.5
+        savi = diff.divide(nir_plus_red.add(0.5)).multiply(1.5).rename('SAVI')
         
         return image.addBands([ndvi, evi, savi])
     
-    def get_forest_health_from_satellite(self, city_name: str, days_back: int = 30) -> Dict[str, Any]:
-        """Fetch real forest health data from Sentinel-2 satellite imagery"""
+    def get_masked_collection(self, roi: ee.Geometry, roi_key: Tuple[float, ...],
+                              start: str, end: str) -> ee.ImageCollection:
+        """Return the cloud-masked, index-augmented collection for an ROI and date window"""
+        key = (roi_key, start, end)
+        with _MASK_CACHE_LOCK:
+            collection = _MASK_CACHE.get(key)
+        if collection is not None:
+            return collection
+        
+        roi_area = roi.area(100)
+        
+        def add_roi_coverage(image: ee.Image) -> ee.Image:
+            # Share of the ROI covered by this scene's footprint
+            return image.set('roi_coverage', image.geometry().intersection(roi, 100).area(100).divide(roi_area))
+        
+        # Drop scenes that only clip a sliver of the ROI and keep just the bands the pipeline reads
+        collection = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+                     .filterBounds(roi)
+                     .filterDate(start, end)
+                     .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30))
+                     .map(add_roi_coverage)
+                     .filter(ee.Filter.gte('roi_coverage', MIN_ROI_COVERAGE))
+                     .select(['SCL', 'B2', 'B4', 'B8', 'MSK_CLDPRB'])
+                     .map(self.mask_clouds_and_shadows)
+                     .map(self.calculate_vegetation_indices))
+        
+        with _MASK_CACHE_LOCK:
+            if len(_MASK_CACHE) >= _MASK_CACHE_MAXSIZE:
+                _MASK_CACHE.pop(next(iter(_MASK_CACHE)))  # Evict the oldest entry
+            _MASK_CACHE[key] = collection
+        return collection
+    
+    def get_vegetation_stats_local(self, composite: ee.Image, roi: ee.Geometry, scale: int = 60) -> Dict[str, float]:
+        """Download a raw-band composite once as NPY and reduce it with NumPy"""
+        # Each download is capped at 32 MB; at 60 m a 20 km ROI is ~110k pixels per band
+        url = composite.select(['B2', 'B4', 'B8']).getDownloadURL({
+            'region': roi,
+            'scale': scale,
+            'format': 'NPY'
+        })
+        with urllib.request.urlopen(url, timeout=60) as response:
+            pixels = np.load(io.BytesIO(response.read()))
+        
+        return vegetation_stats_from_bands(pixels['B2'], pixels['B4'], pixels['B8'])
+    
+    def get_forest_health_from_satellite(self, city_name: str, days_back: int = 30, scale: int = 20,
+                                         bbox: Optional[Tuple[float, float, float, float]] = None,
+                                         allow_export: bool = False, local_stats: bool = False) -> Dict[str, Any]:
+        """Fetch real forest health data from Sentinel-2 satellite imagery, cached per city and hour"""
+        bbox = tuple(bbox) if bbox else None
+        key = _summary_cache_key(city_name, days_back, scale, bbox, local_stats)
+        with _SUMMARY_CACHE_LOCK:
+            cached = _SUMMARY_CACHE.get(key)
+        if cached is not None:
+            return cached
+        
+        forest_data = self._fetch_forest_health(city_name, days_back, scale, bbox, allow_export, local_stats)
+        if forest_data is not None and forest_data['data_source'] != 'pending':
+            with _SUMMARY_CACHE_LOCK:
+                if len(_SUMMARY_CACHE) >= _SUMMARY_CACHE_MAXSIZE:
+                    _SUMMARY_CACHE.pop(next(iter(_SUMMARY_CACHE)))  # Evict the oldest entry
+                _SUMMARY_CACHE[key] = forest_data
+        return forest_data
+    
+    def _fetch_forest_health(self, city_name: str, days_back: int, scale: int,
+                             bbox: Optional[Tuple[float, float, float, float]] = None,
+                             allow_export: bool = False, local_stats: bool = False) -> Dict[str, Any]:
+        """Run the Earth Engine pipeline for one city, over bbox (min_lon, min_lat, max_lon, max_lat) if given"""
         
         if not self.authenticated:
             logger.error("Earth Engine not authenticated. Falling back to synthetic data.")
             return None
         
         try:
-            # Get coordinates for city
-            lat, lon = self.get_coordinates_for_city(city_name)
-            roi = self.create_roi_from_coordinates(lat, lon, buffer_km=10)
+            if bbox:
+                # Caller-supplied bounds; buffer_km is the half-side of the square with the same area
+                min_lon, min_lat, max_lon, max_lat = bbox
+                lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+                buffer_km = 111.0 * math.sqrt((max_lon - min_lon) * (max_lat - min_lat)) / 2
+                roi = ee.Geometry.Rectangle(list(bbox))
+                roi_key = bbox
+            else:
+                # Get coordinates for city
+                lat, lon = self.get_coordinates_for_city(city_name)
+                buffer_km = 10
+                roi = self.create_roi_from_coordinates(lat, lon, buffer_km=buffer_km)
+                roi_key = (lat, lon, buffer_km)
             
             # Date range
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days_back)
             
-            # Load Sentinel-2 Surface Reflectance collection
-            collection = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-                         .filterBounds(roi)
-                         .filterDate(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-                         .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 30))
-                         .map(self.mask_clouds_and_shadows)
-                         .map(self.calculate_vegetation_indices))
-            
-            # Check if we have any images
-            image_count = collection.size().getInfo()
-            if image_count == 0:
-                logger.warning(f"No clear Sentinel-2 images found for {city_name} in last {days_back} days")
-                return None
+            # Load the masked Sentinel-2 Surface Reflectance collection
+            collection = self.get_masked_collection(
+                roi, roi_key, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+            )
             
             # Get median composite to reduce cloud influence
             composite = collection.median()
             
             # Calculate statistics over the region
             stats = composite.select(['NDVI', 'EVI', 'SAVI']).reduceRegion(
-                reducer=ee.Reducer.mean().combine(
-                    reducer2=ee.Reducer.stdDev(),
-                    sharedInputs=True
-                ).combine(
-                    reducer2=ee.Reducer.minMax(),
-                    sharedInputs=True
-                ),
+                reducer=self.index_stats_reducer(),
                 geometry=roi,
-                scale=10,  # 10m resolution
+                scale=scale,  # 20m by default; pass 10 for full Sentinel-2 resolution
                 maxPixels=1e9
             )
             
-            stats_dict = stats.getInfo()
+            # Fraction of unmasked pixels, sampled coarsely so sparse composites are cheap to reject
+            size = collection.size()
+            valid_frac = ee.Number(ee.Algorithms.If(
+                size.gt(0),
+                composite.select('NDVI').mask().reduceRegion(ee.Reducer.mean(), roi, 40).get('NDVI'),
+                0
+            ))
             
-            # Extract NDVI statistics
-            ndvi_mean = stats_dict.get('NDVI_mean', 0.3)
-            ndvi_std = stats_dict.get('NDVI_stdDev', 0.1)
-            ndvi_min = stats_dict.get('NDVI_min', 0.0)
-            ndvi_max = stats_dict.get('NDVI_max', 0.8)
+            # Image count, valid fraction and statistics come back in a single round-trip;
+            # the full reduction only runs when enough clear pixels remain
+            summary = ee.Dictionary({
+                'count': size,
+                'valid_frac': valid_frac,
+                'stats': ee.Algorithms.If(valid_frac.gte(MIN_VALID_FRACTION),
+                                          ee.Dictionary() if local_stats else stats, ee.Dictionary())
+            })
             
-            # Extract EVI statistics  
-            evi_mean = stats_dict.get('EVI_mean', 0.2)
+            context = {
+                'city_name': city_name, 'lat': lat, 'lon': lon, 'buffer_km': buffer_km, 'scale': scale,
+                'days_back': days_back, 'bbox': list(bbox) if bbox else None,
+                'date_range': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+            }
             
-            # Calculate forest health metrics from vegetation indices
-            forest_data = self.calculate_forest_metrics_from_indices(
-                ndvi_mean, ndvi_std, ndvi_min, ndvi_max, evi_mean, city_name, roi
-            )
+            area_km2 = (2 * buffer_km) ** 2 * math.cos(math.radians(lat))
+            if allow_export and EXPORT_BUCKET and area_km2 > EXPORT_MIN_AREA_KM2 and not local_stats:
+                return self.submit_summary_export(summary, context)
             
-            forest_data.update({
-                'data_source': 'sentinel_2_satellite',
-                'satellite_info': {
-                    'dataset': 'COPERNICUS/S2_SR_HARMONIZED',
-                    'images_used': image_count,
-                    'date_range': f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-                    'coordinates': [lat, lon],
-                    'buffer_km': 10
-                },
-                'vegetation_indices': {
-                    'ndvi_mean': round(ndvi_mean, 3),
-                    'ndvi_std': round(ndvi_std, 3),
-                    'ndvi_range': [round(ndvi_min, 3), round(ndvi_max, 3)],
-                    'evi_mean': round(evi_mean, 3)
-                }
-            })
+            result = _get_info(summary)
+            if local_stats and result['count'] > 0 and result['valid_frac'] >= MIN_VALID_FRACTION:
+                # Opt-in: reduce a downloaded raw-band composite with NumPy instead of server-side
+                result['stats'] = self.get_vegetation_stats_local(composite, roi, scale=max(scale, 60))
             
-            logger.info(f"Successfully fetched satellite data for {city_name}")
-            return forest_data
+            return self.forest_data_from_summary(result, context)
             
         except Exception as e:
             logger.error(f"Error fetching satellite data for {city_name}: {e}")
             return None
     
+    def forest_data_from_summary(self, result: Dict[str, Any], context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Turn an evaluated {count, valid_frac, stats} summary into the forest data payload"""
+        city_name = context['city_name']
+        image_count = result['count']
+        if image_count == 0:
+            logger.warning(f"No clear Sentinel-2 images found for {city_name} in last {context['days_back']} days")
+            return None
+        
+        if result['valid_frac'] < MIN_VALID_FRACTION:
+            logger.warning(f"Only {result['valid_frac']:.0%} clear pixels for {city_name}, skipping statistics")
+            return None
+        
+        forest_data = self.build_forest_data(
+            result['stats'], city_name, context['lat'], context['lon'], context['buffer_km'],
+            context['scale'], image_count, context['date_range']
+        )
+        if context['bbox']:
+            forest_data['satellite_info']['bbox'] = context['bbox']
+        
+        logger.info(f"Successfully fetched satellite data for {city_name}")
+        return forest_data
+    
+    def submit_summary_export(self, summary: ee.Dictionary, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Start an export task writing the summary to EXPORT_BUCKET and return a pending payload"""
+        job_name = f"ecomind_{context['city_name'].lower().replace(' ', '_')}_{int(time.time())}"
+        prefix = f"ecomind/{job_name}"
+        
+        # The flattened summary rides along as the properties of one geometry-less feature
+        properties = ee.Dictionary(summary.get('stats')).combine(summary.select(['count', 'valid_frac']))
+        task = ee.batch.Export.table.toCloudStorage(
+            collection=ee.FeatureCollection([ee.Feature(None, properties)]),
+            description=job_name,
+            bucket=EXPORT_BUCKET,
+            fileNamePrefix=prefix,
+            fileFormat='GeoJSON'
+        )
+        task.start()
+        
+        logger.info(f"Submitted export {task.id} for {context['city_name']}")
+        return {
+            'location': context['city_name'],
+            'status': 'pending',
+            'data_source': 'pending',
+            'job_id': task.id,
+            'output_uri': f"gs://{EXPORT_BUCKET}/{prefix}.geojson",
+            'export_context': context,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def get_export_result(self, pending: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Poll a pending export once: the pending payload while running, forest data when done, None on failure"""
+        state = ee.data.getTaskStatus([pending['job_id']])[0]['state']
+        if state in ('FAILED', 'CANCELLED', 'UNKNOWN'):
+            logger.error(f"Export {pending['job_id']} ended in state {state}")
+            return None
+        if state != 'COMPLETED':
+            return pending
+        
+        # Read through the public GCS endpoint; the bucket must be readable by this client
+        url = 'https://storage.googleapis.com/' + pending['output_uri'][len('gs://'):]
+        with urllib.request.urlopen(url, timeout=60) as response:
+            collection = json.loads(response.read())
+        
+        stats = collection['features'][0]['properties']
+        summary = {'count': stats.pop('count'), 'valid_frac': stats.pop('valid_frac'), 'stats': stats}
+        return self.forest_data_from_summary(summary, pending['export_context'])
+    
+    def index_stats_reducer(self) -> ee.Reducer:
+        """Mean + percentile + stdDev reducer used for the NDVI/EVI/SAVI statistics"""
+        # All three share one pass over the pixels; the percentile gives min (p0) and max (p100)
+        return ee.Reducer.mean().combine(
+            reducer2=ee.Reducer.percentile([0, 100]),
+            sharedInputs=True
+        ).combine(
+            reducer2=ee.Reducer.stdDev(),
+            sharedInputs=True
+        )
+    
+    def build_forest_data(self, stats_dict: Dict[str, Any], city_name: str, lat: float, lon: float,
+                          buffer_km: float, scale: int, image_count: int, date_range: str) -> Dict[str, Any]:
+        """Turn reducer statistics for one ROI into the forest data payload"""
+        # Extract NDVI statistics
+        ndvi_mean = stats_dict.get('NDVI_mean', 0.3)
+        ndvi_std = stats_dict.get('NDVI_stdDev', 0.1)
+        ndvi_min = stats_dict.get('NDVI_p0', 0.0)
+        ndvi_max = stats_dict.get('NDVI_p100', 0.8)
+        
+        # Extract EVI statistics  
+        evi_mean = stats_dict.get('EVI_mean', 0.2)
+        
+        # Calculate forest health metrics from vegetation indices
+        forest_data = self.calculate_forest_metrics_from_indices(
+            ndvi_mean, ndvi_std, ndvi_min, ndvi_max, evi_mean, city_name, lat, buffer_km
+        )
+        
+        # Round all reported index statistics in one pass
+        r_mean, r_std, r_min, r_max, r_evi = np.round(
+            [ndvi_mean, ndvi_std, ndvi_min, ndvi_max, evi_mean], 3
+        ).tolist()
+        
+        forest_data.update({
+            'data_source': 'sentinel_2_satellite',
+            'satellite_info': {
+                'dataset': 'COPERNICUS/S2_SR_HARMONIZED',
+                'images_used': image_count,
+                'date_range': date_range,
+                'coordinates': [lat, lon],
+                'buffer_km': buffer_km,
+                'scale_m': scale
+            },
+            'vegetation_indices': {
+                'ndvi_mean': r_mean,
+                'ndvi_std': r_std,
+                'ndvi_range': [r_min, r_max],
+                'evi_mean': r_evi
+            }
+        })
+        return forest_data
+    
     def calculate_forest_metrics_from_indices(self, ndvi_mean: float, ndvi_std: float, 
                                             ndvi_min: float, ndvi_max: float, evi_mean: float,
-                                            city_name: str, roi: ee.Geometry) -> Dict[str, Any]:
+                                            city_name: str, lat: float, buffer_km: float) -> Dict[str, Any]:
         """Calculate forest health metrics from vegetation indices"""
         
         # Estimate forest area based on NDVI thresholds
@@ -236,67 +570,20 @@ class SentinelDataFetcher:
         # NDVI < 0.2 indicates sparse/no vegetation
         
         # Estimate total area in hectares
-        area_m2 = roi.area(maxError=1).getInfo()
+        # The ROI spans 2*buffer_km north-south; east-west its degree width shrinks with cos(latitude)
+        side_m = 2 * buffer_km * 1000.0
+        area_m2 = side_m * side_m * math.cos(math.radians(lat))
         total_area_ha = area_m2 / 10000
         
-        # Estimate forest coverage based on NDVI
-        if ndvi_mean > 0.5:
-            forest_coverage_pct = 0.7  # 70% forest coverage
-        elif ndvi_mean > 0.3:
-            forest_coverage_pct = 0.4  # 40% forest coverage  
-        elif ndvi_mean > 0.2:
-            forest_coverage_pct = 0.2  # 20% forest coverage
-        else:
-            forest_coverage_pct = 0.05  # 5% forest coverage
-        
-        forest_area_ha = total_area_ha * forest_coverage_pct
-        
-        # Estimate tree count (approximately 400-800 trees per hectare in forests)
-        trees_per_hectare = 400 + (ndvi_mean * 400)  # Scale with vegetation density
-        total_trees = int(forest_area_ha * trees_per_hectare)
-        
-        # Health classification based on NDVI and EVI
-        # Healthy: NDVI > 0.6, EVI > 0.4
-        # Moderate: NDVI 0.4-0.6, EVI 0.2-0.4  
-        # Stressed: NDVI 0.2-0.4, EVI 0.1-0.2
-        # Unhealthy: NDVI < 0.2, EVI < 0.1
-        
-        if ndvi_mean > 0.6 and evi_mean > 0.4:
-            healthy_pct = 0.7
-            moderate_pct = 0.2
-            stressed_pct = 0.08
-            unhealthy_pct = 0.02
-        elif ndvi_mean > 0.4 and evi_mean > 0.2:
-            healthy_pct = 0.5
-            moderate_pct = 0.3
-            stressed_pct = 0.15
-            unhealthy_pct = 0.05
-        elif ndvi_mean > 0.2 and evi_mean > 0.1:
-            healthy_pct = 0.3
-            moderate_pct = 0.3
-            stressed_pct = 0.25
-            unhealthy_pct = 0.15
-        else:
-            healthy_pct = 0.15
-            moderate_pct = 0.25
-            stressed_pct = 0.35
-            unhealthy_pct = 0.25
-        
-        # Calculate tree counts by health category
-        healthy_count = int(total_trees * healthy_pct)
-        moderate_count = int(total_trees * moderate_pct)
-        stressed_count = int(total_trees * stressed_pct)
-        unhealthy_count = total_trees - healthy_count - moderate_count - stressed_count
-        
-        # Carbon sequestration based on forest health
-        # Healthy forests: 5-8 tons CO2/hectare/year
-        # Moderate forests: 3-5 tons CO2/hectare/year
-        # Stressed forests: 1-3 tons CO2/hectare/year
-        # Unhealthy forests: 0.5-1 tons CO2/hectare/year
-        
-        carbon_rate = (healthy_pct * 6.5 + moderate_pct * 4.0 + 
-                      stressed_pct * 2.0 + unhealthy_pct * 0.75)
-        carbon_tons = forest_area_ha * carbon_rate
+        # Coverage, tree counts, health split and carbon come from the batched path for one city
+        metrics = calculate_forest_metrics_batch([ndvi_mean], [evi_mean], [total_area_ha])
+        total_trees = int(metrics['tree_count'][0])
+        healthy_count, moderate_count, stressed_count, unhealthy_count = metrics['health_counts'][0].tolist()
+        forest_area_ha = float(metrics['forest_area_ha'][0])
+        carbon_tons = float(metrics['carbon_tons'][0])
+        
+        # Health shares and coverage as percentages, rounded together
+        health_pcts = np.round(np.append(metrics['health_pcts'][0], metrics['coverage'][0]) * 100, 1).tolist()
         
         return {
             'location': city_name,
@@ -308,55 +595,109 @@ class SentinelDataFetcher:
             'carbon_tons': round(carbon_tons, 2),
             'forest_area_ha': round(forest_area_ha, 2),
             'total_area_ha': round(total_area_ha, 2),
-            'forest_coverage_pct': round(forest_coverage_pct * 100, 1),
-            'health_percentages': {
-                'healthy': round(healthy_pct * 100, 1),
-                'moderate': round(moderate_pct * 100, 1),
-                'stressed': round(stressed_pct * 100, 1),
-                'unhealthy': round(unhealthy_pct * 100, 1)
-            },
+            'forest_coverage_pct': health_pcts[4],
+            'health_percentages': dict(zip(('healthy', 'moderate', 'stressed', 'unhealthy'), health_pcts[:4])),
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
 
 
-def get_sentinel_data(city_name: str) -> Optional[Dict[str, Any]]:
-    """Main function to get Sentinel-2 satellite data for a city"""
-    fetcher = SentinelDataFetcher()
-    return fetcher.get_forest_health_from_satellite(city_name)
+def calculate_forest_metrics_batch(ndvi_means, evi_means, total_area_has) -> Dict[str, np.ndarray]:
+    """Vectorized forest metrics for N cities: coverage, tree counts, health split and carbon"""
+    ndvi_means = np.asarray(ndvi_means, dtype=np.float64)
+    total_area_has = np.asarray(total_area_has, dtype=np.float64)
+    
+    # Forest coverage and health level on the float thresholds, so results match at the edges
+    coverage, levels = classify_indices(ndvi_means, np.asarray(evi_means, dtype=np.float64))
+    forest_area_has = total_area_has * coverage
+    
+    # Approximately 400-800 trees per hectare, scaling with vegetation density
+    totals = (forest_area_has * (400 + ndvi_means * 400)).astype(np.int64)
+    
+    # Tree counts per health category; unhealthy absorbs the rounding residual
+    pcts = _HEALTH_TABLE[levels]
+    counts = (totals[:, None] * pcts).astype(np.int64)
+    counts[:, 3] = totals - counts[:, :3].sum(axis=1)
+    
+    # Carbon sequestration: healthy 5-8, moderate 3-5, stressed 1-3, unhealthy 0.5-1 tons CO2/ha/year
+    carbon_tons = forest_area_has * (pcts @ _CARBON_RATES)
+    
+    return {
+        'coverage': coverage,
+        'forest_area_ha': forest_area_has,
+        'tree_count': totals,
+        'health_pcts': pcts,
+        'health_counts': counts,
+        'carbon_tons': carbon_tons
+    }
+
+
+# Shared fetcher so Earth Engine is initialized once per process
+_FETCHER: Optional[SentinelDataFetcher] = None
+_FETCHER_LOCK = threading.Lock()
+
+# A failed Earth Engine initialization is retried at most this often instead of cached for good
+_AUTH_RETRY_SECONDS = 60.0
+_FETCHER_AUTH_ATTEMPT = 0.0
+
+def _get_fetcher() -> SentinelDataFetcher:
+    """Return the process-wide SentinelDataFetcher, creating it on first use and retrying failed auth"""
+    global _FETCHER, _FETCHER_AUTH_ATTEMPT
+    with _FETCHER_LOCK:
+        now = time.monotonic()
+        if _FETCHER is None:
+            _FETCHER = SentinelDataFetcher()
+            _FETCHER_AUTH_ATTEMPT = now
+        elif not _FETCHER.authenticated and now - _FETCHER_AUTH_ATTEMPT >= _AUTH_RETRY_SECONDS:
+            _FETCHER_AUTH_ATTEMPT = now
+            _FETCHER.initialize_earth_engine()
+        return _FETCHER
+
+
+def get_sentinel_data(city_name: str, bbox: Optional[Tuple[float, float, float, float]] = None,
+                      allow_export: bool = False, local_stats: bool = False) -> Optional[Dict[str, Any]]:
+    """Main function to get Sentinel-2 satellite data for a city, optionally over an explicit bbox"""
+    # The whole pipeline is deferred server-side and evaluated with a single getInfo(); with
+    # allow_export, large ROIs instead return a 'pending' payload to poll with get_export_result,
+    # and local_stats downloads the raw bands and reduces them with NumPy
+    return _get_fetcher().get_forest_health_from_satellite(city_name, bbox=bbox, allow_export=allow_export,
+                                                           local_stats=local_stats)
+
+
+def get_export_result(pending: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Poll a pending export returned by get_sentinel_data(..., allow_export=True)"""
+    return _get_fetcher().get_export_result(pending)
 
 
+def get_sentinel_data_batch(cities: List[str], max_workers: int = 25) -> List[Optional[Dict[str, Any]]]:
+    """Get Sentinel-2 satellite data for several cities concurrently, in input order"""
+    if not cities:
+        return []
+    
+    # getInfo() blocks on network I/O, so threads overlap the Earth Engine round-trips
+    fetcher = _get_fetcher()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(cities))) as executor:
+        return list(executor.map(fetcher.get_forest_health_from_satellite, cities))
+
+
+# Uniform ranges for the synthetic healthy, moderate, stressed shares and carbon rate
+_SYNTHETIC_LOW = np.array([0.35, 0.20, 0.15, 3.0])
+_SYNTHETIC_SPAN = np.array([0.30, 0.15, 0.10, 3.0])
+
 # Fallback to synthetic data if satellite fails
 def get_synthetic_fallback_data(city_name: str) -> Dict[str, Any]:
     """Generate synthetic data as fallback when satellite data unavailable"""
-    import random
-    import numpy as np
-    
-    # Set seed for consistency
-    random.seed(hash(city_name) % 1000000)
-    np.random.seed(hash(city_name) % 1000000)
-    
-    # City size factors
-    population_factors = {
-        'mumbai': 1.0, 'delhi': 0.9, 'bangalore': 0.7, 'chennai': 0.6,
-        'kolkata': 0.8, 'hyderabad': 0.65, 'pune': 0.5, 'ahmedabad': 0.4,
-        'jaipur': 0.3, 'lucknow': 0.25, 'kanpur': 0.2, 'nagpur': 0.15
-    }
-    
-    city_lower = city_name.lower()
-    size_factor = 0.1
+    # One seeded generator for every draw; crc32 is stable across processes, unlike str hash()
+    rng = np.random.default_rng(zlib.crc32(city_name.encode('utf-8')))
     
-    for major_city, factor in population_factors.items():
-        if major_city in city_lower:
-            size_factor = factor
-            break
+    # City size factor
+    size_factor = _lookup_population_factor(city_name.lower().strip())
     
     # Generate synthetic data
-    base_trees = int(np.random.normal(50000, 15000) * size_factor)
+    base_trees = int((rng.standard_normal() * 15000 + 50000) * size_factor)
     base_trees = max(1000, base_trees)
     
-    healthy_pct = np.random.uniform(0.35, 0.65)
-    moderate_pct = np.random.uniform(0.20, 0.35)
-    stressed_pct = np.random.uniform(0.15, 0.25)
+    # Healthy, moderate and stressed shares plus the carbon rate, mapped from one uniform batch
+    healthy_pct, moderate_pct, stressed_pct, carbon_rate = (_SYNTHETIC_LOW + _SYNTHETIC_SPAN * rng.random(4)).tolist()
     unhealthy_pct = max(0.05, 1.0 - healthy_pct - moderate_pct - stressed_pct)
     
     # Normalize percentages
@@ -373,7 +714,6 @@ def get_synthetic_fallback_data(city_name: str) -> Dict[str, Any]:
     
     # Carbon calculation
     hectares = (base_trees * 25) / 10000
-    carbon_rate = np.random.uniform(3.0, 6.0)
     carbon_tons = hectares * carbon_rate
     
     return {
@@ -1,6 +1,7 @@
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 def test_api():
     base_url = "http://localhost:8000"
@@ -8,23 +9,21 @@ def test_api():
     # Wait a moment for server to start
     time.sleep(3)
     
+    endpoints = [
+        ("Overview", "/api/metrics/overview"),
+        ("Health Distribution", "/api/health/distribution"),
+        ("Carbon Data", "/api/carbon/data")
+    ]
+    
     try:
-        # Test overview endpoint
-        response = requests.get(f"{base_url}/api/metrics/overview")
-        print("Overview API Response:")
-        print(json.dumps(response.json(), indent=2))
-        print("\n" + "="*50 + "\n")
-        
-        # Test health distribution
-        response = requests.get(f"{base_url}/api/health/distribution")
-        print("Health Distribution API Response:")
-        print(json.dumps(response.json(), indent=2))
-        print("\n" + "="*50 + "\n")
+        # Fetch all endpoints concurrently over one keep-alive session
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+            responses = list(executor.map(lambda e: session.get(f"{base_url}{e[1]}"), endpoints))
         
-        # Test carbon data
-        response = requests.get(f"{base_url}/api/carbon/data")
-        print("Carbon Data API Response:")
-        print(json.dumps(response.json(), indent=2))
+        for (title, _), response in zip(endpoints, responses):
+            print(f"{title} API Response:")
+            print(json.dumps(response.json(), indent=2))
+            print("\n" + "="*50 + "\n")
         
     except requests.exceptions.RequestException as e:
         print(f"API test failed: {e}")
@@ -8,11 +8,14 @@ def test_end_to_end():
     print("🌳 EcoMind Dynamic City Generation - End-to-End Test")
     print("=" * 60)
     
+    # Keep-alive session so the steps below reuse one connection
+    session = requests.Session()
+    
     # Test the search endpoint with a new city
     new_city = "Indore"
     print(f"\n🔍 Testing Search for New City: {new_city}")
     
-    response = requests.get(f"{base_url}/api/locations/search?q={new_city}")
+    response = session.get(f"{base_url}/api/locations/search?q={new_city}")
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200:
@@ -29,7 +32,7 @@ def test_end_to_end():
     
     # Test getting all available locations
     print(f"\n📍 Testing Available Locations Endpoint:")
-    response = requests.get(f"{base_url}/api/locations/list")
+    response = session.get(f"{base_url}/api/locations/list")
     
     if response.status_code == 200:
         locations = response.json()
@@ -46,7 +49,7 @@ def test_end_to_end():
     test_city = "Bhopal"
     print(f"\n📊 Testing Metrics for Another New City: {test_city}")
     
-    response = requests.get(f"{base_url}/api/metrics/overview?location={test_city}")
+    response = session.get(f"{base_url}/api/metrics/overview?location={test_city}")
     if response.status_code == 200:
         metrics = response.json()
         print(f"✅ Auto-Generated Metrics for {test_city}:")
@@ -1,5 +1,6 @@
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 def test_integration():
     """Test frontend-backend integration"""
@@ -19,23 +20,35 @@ def test_integration():
         "/api/trends/weekly"
     ]
     
-    print("🔗 Testing API Endpoints:")
-    for endpoint in endpoints:
+    # One pooled keep-alive session shared by every probe
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+    session.mount('http://', adapter)
+    
+    def probe(endpoint):
         try:
-            response = requests.get(f"{api_base}{endpoint}", timeout=5)
-            if response.status_code == 200:
-                print(f"  ✅ {endpoint} - OK")
-            else:
-                print(f"  ❌ {endpoint} - Error {response.status_code}")
+            return endpoint, session.get(f"{api_base}{endpoint}", timeout=5), None
         except requests.exceptions.RequestException as e:
-            print(f"  ❌ {endpoint} - Connection error: {e}")
+            return endpoint, None, e
+    
+    print("🔗 Testing API Endpoints:")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(probe, endpoints))
+    
+    for endpoint, response, error in results:
+        if error is not None:
+            print(f"  ❌ {endpoint} - Connection error: {error}")
+        elif response.status_code == 200:
+            print(f"  ✅ {endpoint} - OK")
+        else:
+            print(f"  ❌ {endpoint} - Error {response.status_code}")
     
     print(f"\n🌐 Frontend URL: {frontend_url}")
     print(f"🔧 API URL: {api_base}")
     
     # Test frontend accessibility
     try:
-        response = requests.get(frontend_url, timeout=5)
+        response = session.get(frontend_url, timeout=5)
         if response.status_code == 200:
             print("  ✅ Frontend is accessible")
         else:
@@ -45,8 +58,9 @@ def test_integration():
     
     print("\n📊 Sample Data:")
     try:
-        response = requests.get(f"{api_base}/api/metrics/overview")
-        if response.status_code == 200:
+        # Reuse the overview response from the probes above
+        response = results[0][1]
+        if response is not None and response.status_code == 200:
             data = response.json()
             print(f"  🌳 Total Trees: {data.get('total_trees', 'N/A'):,}")
             print(f"  🍃 Forest Coverage: {data.get('forest_coverage_hectares', 'N/A')} hectares")
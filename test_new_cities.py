@@ -1,6 +1,17 @@
+import asyncio
 import requests
 import json
 
+async def fetch_all(session, base_url, test_cities, test_city):
+    """Send every probe concurrently; responses (or exceptions) come back in request order"""
+    def get(path, **params):
+        return session.get(f"{base_url}{path}", params=params)
+    
+    calls = [asyncio.to_thread(get, "/api/locations/search", q=city) for city in test_cities]
+    calls.append(asyncio.to_thread(get, "/api/metrics/overview", location=test_city))
+    calls.append(asyncio.to_thread(get, "/api/health/distribution", location=test_city))
+    return await asyncio.gather(*calls, return_exceptions=True)
+
 def test_new_city_feature():
     """Test the new city auto-generation feature"""
     base_url = "http://localhost:8000"
@@ -8,15 +19,24 @@ def test_new_city_feature():
     print("🏙️ Testing New City Generation Feature")
     print("=" * 50)
     
-    # Test cities to add
+    # Test cities to add, plus a new city for the overview and health checks
     test_cities = ["Pune", "Jaipur", "Ahmedabad", "Chandigarh", "Kochi"]
+    test_city = "Lucknow"
     
-    for city in test_cities:
+    # All probes are independent, so fire them together over one pooled keep-alive session
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+    session.mount('http://', adapter)
+    *search_results, overview_response, health_response = asyncio.run(
+        fetch_all(session, base_url, test_cities, test_city)
+    )
+    
+    for city, response in zip(test_cities, search_results):
         print(f"\n🔍 Testing city: {city}")
         
         try:
-            # Test search endpoint
-            response = requests.get(f"{base_url}/api/locations/search?q={city}")
+            if isinstance(response, Exception):
+                raise response
             if response.status_code == 200:
                 data = response.json()
                 if data['found_existing']:
@@ -36,9 +56,10 @@ def test_new_city_feature():
     print("\n📊 Testing Overview with New Cities:")
     
     # Test overview for a new city
-    test_city = "Lucknow"
     try:
-        response = requests.get(f"{base_url}/api/metrics/overview?location={test_city}")
+        response = overview_response
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             data = response.json()
             print(f"  ✅ {test_city} Overview:")
@@ -54,7 +75,9 @@ def test_new_city_feature():
     print("\n🔄 Testing Health Data for New City:")
     
     try:
-        response = requests.get(f"{base_url}/api/health/distribution?location={test_city}")
+        response = health_response
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             data = response.json()
             print(f"  ✅ {test_city} Health Distribution:")
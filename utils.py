@@ -11,22 +11,149 @@ import pandas as pd
 import geopandas as gpd
 from rasterio.windows import Window
 from rasterio import features
+from numpy.lib.stride_tricks import sliding_window_view
 from pathlib import Path
 import cv2
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from torch.utils.data import Dataset, DataLoader
+from torch.utils.checkpoint import checkpoint
 from sklearn.model_selection import train_test_split
+from joblib import Parallel, delayed
 from shapely.geometry import shape
 import albumentations as A
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Tuple, Dict, List, Optional
+import math
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+# Sentinel-2 surface reflectance is stored as reflectance * 10000
+REFLECTANCE_SCALE = 10000.0
+
+# GDAL settings for (cloud-optimized) GeoTIFF reads: no sidecar directory listing, a 512 MB
+# block cache so overlapping windows hit memory, and multiplexed HTTP for remote COGs
+RASTERIO_ENV_OPTIONS = {
+    'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+    'GDAL_CACHEMAX': 512,
+    'VSI_CACHE': True,
+    'CPL_VSIL_CURL_ALLOWED_EXTENSIONS': '.tif',
+    'GDAL_HTTP_MULTIPLEX': 'YES'
+}
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def accumulate_patches(preds, ii, jj, pred_out, count_out, size):
+        """Overlap-add a (B, P, P) batch of patch predictions into the output grids."""
+        # Serial on purpose: neighbouring patches overlap, so a prange over k would race
+        for k in range(len(ii)):
+            for y in range(size):
+                for x in range(size):
+                    pred_out[ii[k] + y, jj[k] + x] += preds[k, y, x]
+                    count_out[ii[k] + y, jj[k] + x] += 1
+    
+    @njit(parallel=True, cache=True)
+    def fill_patches(image, mask, size, ii, jj, out_img, out_mask, scale):
+        """Copy the (bands, P, P) patches at (ii[k], jj[k]) into out_img[k] as clipped, rounded HWC."""
+        # Each k owns its own output slot, so the patches can be filled in parallel
+        for k in prange(len(ii)):
+            for c in range(image.shape[0]):
+                for y in range(size):
+                    for x in range(size):
+                        out_img[k, y, x, c] = np.rint(min(max(image[c, ii[k] + y, jj[k] + x], 0), scale))
+            for y in range(size):
+                for x in range(size):
+                    out_mask[k, y, x] = mask[ii[k] + y, jj[k] + x]
+else:
+    def accumulate_patches(preds, ii, jj, pred_out, count_out, size):
+        """Overlap-add a (B, P, P) batch of patch predictions into the output grids."""
+        for k in range(len(ii)):
+            pred_out[ii[k]:ii[k] + size, jj[k]:jj[k] + size] += preds[k]
+            count_out[ii[k]:ii[k] + size, jj[k]:jj[k] + size] += 1
+
+
+def available_memory_bytes() -> int:
+    """Physical memory currently available, or 0 if the platform can't report it."""
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return 0
+
+
+def random_affine_theta(n: int, device: torch.device) -> torch.Tensor:
+    """Sample (N, 2, 3) affine matrices fusing random flips, 90° rotations and shift-scale-rotate."""
+    ones = torch.ones(n, device=device)
+    zeros = torch.zeros(n, device=device)
+    
+    # Horizontal/vertical flips as sign changes of the x and y axes (p=0.5 each)
+    flip_x = torch.where(torch.rand(n, device=device) < 0.5, -ones, ones)
+    flip_y = torch.where(torch.rand(n, device=device) < 0.5, -ones, ones)
+    
+    # RandomRotate90 (p=0.5), then ±45° rotation, 0.9-1.1 scale and ±10% shift (p=0.5)
+    quarter = torch.randint(0, 4, (n,), device=device) * (torch.rand(n, device=device) < 0.5)
+    ssr = torch.rand(n, device=device) < 0.5
+    angle = quarter * (math.pi / 2) + torch.where(ssr, torch.empty(n, device=device).uniform_(-math.pi / 4, math.pi / 4), zeros)
+    scale = torch.where(ssr, torch.empty(n, device=device).uniform_(0.9, 1.1), ones)
+    shift_x = torch.where(ssr, torch.empty(n, device=device).uniform_(-0.2, 0.2), zeros)  # Grid coords span [-1, 1]
+    shift_y = torch.where(ssr, torch.empty(n, device=device).uniform_(-0.2, 0.2), zeros)
+    
+    # rotation / scale @ diag(flip_x, flip_y), plus the shift
+    cos, sin = torch.cos(angle) / scale, torch.sin(angle) / scale
+    return torch.stack([
+        torch.stack([cos * flip_x, -sin * flip_y, shift_x], dim=1),
+        torch.stack([sin * flip_x, cos * flip_y, shift_y], dim=1)
+    ], dim=1)
+
+
+def compile_model(model: nn.Module, enabled: bool = False):
+    """Compile a model with TorchInductor, falling back to eager mode if compilation fails."""
+    if not enabled or not hasattr(torch, 'compile'):
+        return model
+    try:
+        # Default mode without fullgraph: the smaller final batch of an epoch triggers one
+        # recompile with dynamic shapes, and graph breaks fall back to eager instead of raising
+        compiled = torch.compile(model)
+    except Exception as e:
+        print(f"⚠️ torch.compile unavailable ({e}), using eager model")
+        return model
+    return _EagerFallback(compiled, model)
+
+
+class _EagerFallback:
+    """Call a compiled model, switching to the eager model if compilation fails on first use."""
+
+    def __init__(self, compiled, model: nn.Module):
+        self.compiled = compiled
+        self.model = model
+
+    def __call__(self, *args, **kwargs):
+        if self.compiled is not None:
+            try:
+                return self.compiled(*args, **kwargs)
+            except Exception as e:
+                # torch.compile is lazy, so backend errors only surface on the first forward pass
+                print(f"⚠️ torch.compile failed ({e}), falling back to eager model")
+                self.compiled = None
+        return self.model(*args, **kwargs)
+
 
 class EarthEngineDataDownloader:
     """Google Earth Engine data downloader for Sentinel-2 imagery."""
@@ -69,12 +196,9 @@ class EarthEngineDataDownloader:
         cloud_prob = image.select('MSK_CLDPRB')
         scl = image.select('SCL')
         
-        mask = (cloud_prob.lt(5)
-                .And(scl.neq(3))   # Cloud shadows
-                .And(scl.neq(8))   # Cloud medium probability
-                .And(scl.neq(9))   # Cloud high probability
-                .And(scl.neq(10))  # Thin cirrus
-                .And(scl.neq(11))) # Snow/ice
+        # Drop cloud shadows (3), medium/high probability clouds (8, 9), thin cirrus (10)
+        # and snow/ice (11) with one lookup node instead of a chain of comparisons
+        mask = scl.remap([3, 8, 9, 10, 11], [0, 0, 0, 0, 0], 1).And(cloud_prob.lt(5))
         
         return image.updateMask(mask)
     
@@ -178,56 +302,95 @@ class SatelliteDataPreprocessor:
         self.patch_size = patch_size
         
         # Create output directories
-        (self.output_dir / 'train' / 'images').mkdir(parents=True, exist_ok=True)
-        (self.output_dir / 'train' / 'masks').mkdir(parents=True, exist_ok=True)
-        (self.output_dir / 'val' / 'images').mkdir(parents=True, exist_ok=True)
-        (self.output_dir / 'val' / 'masks').mkdir(parents=True, exist_ok=True)
+        (self.output_dir / 'train').mkdir(parents=True, exist_ok=True)
+        (self.output_dir / 'val').mkdir(parents=True, exist_ok=True)
     
     def normalize_image(self, image: np.ndarray) -> np.ndarray:
         """Normalize satellite imagery."""
-        image = image.astype(np.float32) / 10000.0
+        image = image.astype(np.float32) / REFLECTANCE_SCALE
         return np.clip(image, 0, 1)
     
+    def quantize_image(self, image: np.ndarray) -> np.ndarray:
+        """Store raw reflectance as int16, clipped to the range normalize_image keeps."""
+        # Lossless with respect to normalize_image, at half the bytes of float32
+        return np.rint(np.clip(image, 0, REFLECTANCE_SCALE)).astype(np.int16, order='C')
+    
     def extract_patches(self) -> Tuple[np.ndarray, np.ndarray]:
         """Extract patches from large satellite image."""
-        # Read image
-        with rasterio.open(self.image_path) as src:
-            image = src.read()  # Shape: (bands, height, width)
-            height, width = image.shape[1], image.shape[2]
-        
-        # Read mask
-        with rasterio.open(self.mask_path) as src:
-            mask = src.read(1)  # Shape: (height, width)
-        
-        patches_img = []
-        patches_mask = []
+        with rasterio.Env(**RASTERIO_ENV_OPTIONS), rasterio.open(self.image_path) as src, \
+                rasterio.open(self.mask_path) as mask_src:
+            height, width = src.height, src.width
+            image_bytes = src.count * height * width * np.dtype(src.dtypes[0]).itemsize
+            available = available_memory_bytes()
+            
+            # One big read when the image comfortably fits in RAM (or RAM can't be measured)
+            if not available or image_bytes < available // 4:
+                image = src.read()  # Shape: (bands, height, width)
+                mask = mask_src.read(1)  # Shape: (height, width)
+                return self._patches_from_arrays(image, mask)
+            
+            # Otherwise read horizontal strips aligned to the patch grid, each within the budget
+            stride = self.patch_size // 2
+            row_bytes = image_bytes // height
+            patch_rows = max(1, ((available // 4) // row_bytes - self.patch_size) // stride + 1)
+            strip_height = (patch_rows - 1) * stride + self.patch_size
+            
+            patches_img, patches_mask = [], []
+            for top in range(0, height - self.patch_size + 1, patch_rows * stride):
+                window = Window(0, top, width, min(strip_height, height - top))
+                strip_img, strip_mask = self._patches_from_arrays(src.read(window=window),
+                                                                  mask_src.read(1, window=window))
+                patches_img.append(strip_img)
+                patches_mask.append(strip_mask)
+            
+            if not patches_img:  # Shorter than one patch
+                return (np.empty((0, self.patch_size, self.patch_size, src.count), dtype=np.int16),
+                        np.empty((0, self.patch_size, self.patch_size), dtype=mask_src.dtypes[0]))
         
+        return np.concatenate(patches_img), np.concatenate(patches_mask)
+    
+    def _patches_from_arrays(self, image: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Extract the kept, normalized patches from a (bands, H, W) image and its (H, W) mask."""
         # Extract overlapping patches
         stride = self.patch_size // 2  # 50% overlap
-        
-        for i in range(0, height - self.patch_size + 1, stride):
-            for j in range(0, width - self.patch_size + 1, stride):
-                # Extract patch
-                img_patch = image[:, i:i+self.patch_size, j:j+self.patch_size]
-                mask_patch = mask[i:i+self.patch_size, j:j+self.patch_size]
-                
-                # Skip patches with too few trees
-                if np.sum(mask_patch > 0) < 100:
-                    continue
-                
-                # Normalize image
-                img_patch = self.normalize_image(img_patch)
-                
-                # Convert to HWC format
-                img_patch = np.transpose(img_patch, (1, 2, 0))
-                
-                patches_img.append(img_patch)
-                patches_mask.append(mask_patch)
-        
-        return np.array(patches_img), np.array(patches_mask)
+        size = self.patch_size
+        bands, height, width = image.shape
+        if height < size or width < size:
+            return (np.empty((0, size, size, bands), dtype=np.int16),
+                    np.empty((0, size, size), dtype=mask.dtype))
+        
+        # Strided views of every patch position; nothing is copied until the final gather
+        img_win = sliding_window_view(image, (bands, size, size))[0, ::stride, ::stride]
+        mask_win = sliding_window_view(mask, (size, size))[::stride, ::stride]
+        
+        # Tree pixels per patch from a summed-area table, then skip patches with too few trees
+        tree_sat = np.pad((mask > 0).cumsum(axis=0, dtype=np.int32).cumsum(axis=1), ((1, 0), (1, 0)))
+        rows = np.arange(0, height - size + 1, stride)
+        cols = np.arange(0, width - size + 1, stride)
+        tree_pixels = (tree_sat[np.ix_(rows + size, cols + size)] - tree_sat[np.ix_(rows, cols + size)]
+                       - tree_sat[np.ix_(rows + size, cols)] + tree_sat[np.ix_(rows, cols)])
+        keep = tree_pixels >= 100
+        
+        if NUMBA_AVAILABLE:
+            # Gather, HWC transpose and int16 quantization fused in one parallel pass
+            kept_rows, kept_cols = np.nonzero(keep)
+            patches_img = np.empty((len(kept_rows), size, size, bands), dtype=np.int16)
+            patches_mask = np.empty((len(kept_rows), size, size), dtype=mask.dtype)
+            fill_patches(image, mask, size, rows[kept_rows], cols[kept_cols],
+                         patches_img, patches_mask, REFLECTANCE_SCALE)
+            return patches_img, patches_mask
+        
+        # Gather the kept patches in HWC order as int16; normalization happens on the GPU in training
+        patches_img = self.quantize_image(img_win[keep].transpose(0, 2, 3, 1))
+        patches_mask = mask_win[keep]
+        
+        return patches_img, patches_mask
     
     def augment_data(self, images: np.ndarray, masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """Apply data augmentation."""
+        if torch.cuda.is_available():
+            return self._augment_data_gpu(images, masks)
+        
         transform = A.Compose([
             A.HorizontalFlip(p=0.5),
             A.VerticalFlip(p=0.5),
@@ -236,15 +399,51 @@ class SatelliteDataPreprocessor:
             A.RandomBrightnessContrast(p=0.3),
         ])
         
-        aug_images = []
-        aug_masks = []
-        
-        for img, mask in zip(images, masks):
-            transformed = transform(image=img, mask=mask)
-            aug_images.append(transformed['image'])
-            aug_masks.append(transformed['mask'])
+        aug_images = np.empty_like(images)
+        aug_masks = np.empty_like(masks)
+        
+        def augment_one(idx: int):
+            transformed = transform(image=self.normalize_image(images[idx]), mask=masks[idx])
+            aug_images[idx] = self.quantize_image(transformed['image'] * REFLECTANCE_SCALE)
+            aug_masks[idx] = transformed['mask']
+        
+        # OpenCV releases the GIL inside the warps, so threads spread the patches across cores;
+        # each call writes only its own output slot
+        Parallel(n_jobs=-1, prefer='threads')(delayed(augment_one)(idx) for idx in range(len(images)))
+        
+        return aug_images, aug_masks
+    
+    def _augment_data_gpu(self, images: np.ndarray, masks: np.ndarray,
+                          batch_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply the same augmentations on the GPU, resampling each patch only once."""
+        device = torch.device('cuda')
+        aug_images = np.empty_like(images)
+        aug_masks = np.empty_like(masks)
+        
+        with torch.no_grad():
+            for start in range(0, len(images), batch_size):
+                stop = start + batch_size
+                img = torch.from_numpy(images[start:stop]).to(device).permute(0, 3, 1, 2)  # (N, C, H, W)
+                img = img.float().mul_(1 / REFLECTANCE_SCALE).clamp_(0, 1)
+                mask = torch.from_numpy(masks[start:stop]).to(device).unsqueeze(1).float()  # (N, 1, H, W)
+                n = len(img)
+                
+                # Flips, 90° rotations and shift-scale-rotate fused into one grid, sampled once
+                grid = F.affine_grid(random_affine_theta(n, device), img.shape, align_corners=False)
+                img = F.grid_sample(img, grid, mode='bilinear', padding_mode='reflection', align_corners=False)
+                mask = F.grid_sample(mask, grid, mode='nearest', padding_mode='reflection', align_corners=False)
+                
+                # RandomBrightnessContrast (p=0.3) on the image only
+                jitter = (torch.rand(n, 1, 1, 1, device=device) < 0.3).float()
+                alpha = 1 + jitter * torch.empty(n, 1, 1, 1, device=device).uniform_(-0.2, 0.2)
+                beta = jitter * torch.empty(n, 1, 1, 1, device=device).uniform_(-0.2, 0.2)
+                img = (img * alpha + beta).clamp_(0, 1)
+                
+                img = img.mul_(REFLECTANCE_SCALE).round_().to(torch.int16)
+                aug_images[start:stop] = img.permute(0, 2, 3, 1).cpu().numpy()
+                aug_masks[start:stop] = mask[:, 0].cpu().numpy()
         
-        return np.array(aug_images), np.array(aug_masks)
+        return aug_images, aug_masks
     
     def prepare_dataset(self) -> Tuple[int, int]:
         """Complete preprocessing pipeline."""
@@ -274,10 +473,10 @@ class SatelliteDataPreprocessor:
         return len(X_train), len(X_val)
     
     def _save_patches(self, images: np.ndarray, masks: np.ndarray, split: str):
-        """Save patches as numpy files."""
-        for idx, (img, mask) in enumerate(zip(images, masks)):
-            np.save(self.output_dir / split / 'images' / f'patch_{idx}.npy', img)
-            np.save(self.output_dir / split / 'masks' / f'patch_{idx}.npy', mask)
+        """Save patches as one (N, H, W, C) image array and one (N, H, W) mask array per split."""
+        # Single .npy files so TreeDataset can memory-map them instead of opening a file per patch
+        np.save(self.output_dir / split / 'images.npy', np.ascontiguousarray(images))
+        np.save(self.output_dir / split / 'masks.npy', np.ascontiguousarray(masks))
 
 
 # UNet Model Components
@@ -299,11 +498,36 @@ class DoubleConv(nn.Module):
         return self.double_conv(x)
 
 
+class Up(nn.Module):
+    """2x upsampling with a 1x1 channel reduction: bilinear, or learned via pixel shuffle."""
+    
+    def __init__(self, in_channels: int, out_channels: int, mode: str = 'bilinear'):
+        super().__init__()
+        if mode == 'pixel_shuffle':
+            # 1x1 conv to 4x the channels, then each output pixel is written once by a permute;
+            # equivalent to a 2x2 stride-2 transposed conv without overlapping writes
+            self.reduce = nn.Conv2d(in_channels, out_channels * 4, kernel_size=1)
+            self.up = nn.PixelShuffle(2)
+        elif mode == 'bilinear':
+            self.reduce = nn.Conv2d(in_channels, out_channels, kernel_size=1)
+            self.up = nn.Upsample(scale_factor=2, mode='bilinear', align_corners=False)
+        else:
+            raise ValueError(f"Unknown upsampling mode: {mode}")
+    
+    def forward(self, x):
+        # Reduce first: for bilinear the 1x1 conv commutes with the upsample at 1/4 the cost
+        return self.up(self.reduce(x))
+
+
 class UNet(nn.Module):
-    """UNet model for semantic segmentation."""
+    """UNet model for semantic segmentation; returns logits (apply sigmoid for probabilities)."""
     
-    def __init__(self, n_channels: int = 6, n_classes: int = 1):
+    def __init__(self, n_channels: int = 6, n_classes: int = 1, checkpoint_encoder: bool = False,
+                 upsample: str = 'bilinear'):
         super().__init__()
+        # Opt-in for memory-limited training: recompute enc4 and the bottleneck in backward instead
+        # of storing their activations; the recompute also updates their BatchNorm running stats twice
+        self.checkpoint_encoder = checkpoint_encoder
         
         # Encoder
         self.enc1 = DoubleConv(n_channels, 64)
@@ -319,13 +543,13 @@ class UNet(nn.Module):
         self.bottleneck = DoubleConv(512, 1024)
         
         # Decoder
-        self.up4 = nn.ConvTranspose2d(1024, 512, kernel_size=2, stride=2)
+        self.up4 = Up(1024, 512, upsample)
         self.dec4 = DoubleConv(1024, 512)
-        self.up3 = nn.ConvTranspose2d(512, 256, kernel_size=2, stride=2)
+        self.up3 = Up(512, 256, upsample)
         self.dec3 = DoubleConv(512, 256)
-        self.up2 = nn.ConvTranspose2d(256, 128, kernel_size=2, stride=2)
+        self.up2 = Up(256, 128, upsample)
         self.dec2 = DoubleConv(256, 128)
-        self.up1 = nn.ConvTranspose2d(128, 64, kernel_size=2, stride=2)
+        self.up1 = Up(128, 64, upsample)
         self.dec1 = DoubleConv(128, 64)
         
         # Output
@@ -336,10 +560,12 @@ class UNet(nn.Module):
         e1 = self.enc1(x)
         e2 = self.enc2(self.pool1(e1))
         e3 = self.enc3(self.pool2(e2))
-        e4 = self.enc4(self.pool3(e3))
-        
-        # Bottleneck
-        b = self.bottleneck(self.pool4(e4))
+        if self.checkpoint_encoder and self.training and torch.is_grad_enabled():
+            e4 = checkpoint(self.enc4, self.pool3(e3), use_reentrant=False)
+            b = checkpoint(self.bottleneck, self.pool4(e4), use_reentrant=False)
+        else:
+            e4 = self.enc4(self.pool3(e3))
+            b = self.bottleneck(self.pool4(e4))
         
         # Decoder with skip connections
         d4 = self.dec4(torch.cat([self.up4(b), e4], dim=1))
@@ -347,30 +573,39 @@ class UNet(nn.Module):
         d2 = self.dec2(torch.cat([self.up2(d3), e2], dim=1))
         d1 = self.dec1(torch.cat([self.up1(d2), e1], dim=1))
         
-        return torch.sigmoid(self.out(d1))
+        # Raw logits: BCEWithLogitsLoss fuses the sigmoid, callers apply it at inference
+        return self.out(d1)
 
 
 class TreeDataset(Dataset):
     """Custom dataset for tree segmentation."""
     
     def __init__(self, data_dir: str, split: str = 'train'):
-        self.image_dir = Path(data_dir) / split / 'images'
-        self.mask_dir = Path(data_dir) / split / 'masks'
-        self.images = sorted(list(self.image_dir.glob('*.npy')))
+        self.split_dir = Path(data_dir) / split
+        self._open()
+    
+    def _open(self):
+        """Memory-map the patch arrays; copy-on-write so patches can be wrapped as tensors without a copy."""
+        self.images = np.load(self.split_dir / 'images.npy', mmap_mode='c')  # (N, H, W, C)
+        self.masks = np.load(self.split_dir / 'masks.npy', mmap_mode='c')    # (N, H, W)
+    
+    def __getstate__(self):
+        # Spawned DataLoader workers would otherwise receive a full pickled copy of each memmap
+        state = self.__dict__.copy()
+        state['images'] = state['masks'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
     
     def __len__(self):
         return len(self.images)
     
     def __getitem__(self, idx):
-        img_path = self.images[idx]
-        mask_path = self.mask_dir / img_path.name
-        
-        image = np.load(img_path)  # Shape: (H, W, C)
-        mask = np.load(mask_path)   # Shape: (H, W)
-        
         # Convert to torch tensors
-        image = torch.from_numpy(image).permute(2, 0, 1).float()  # (C, H, W)
-        mask = torch.from_numpy(mask).unsqueeze(0).float()  # (1, H, W)
+        image = torch.from_numpy(self.images[idx]).permute(2, 0, 1)  # (C, H, W) int16, normalized on device
+        mask = torch.from_numpy(self.masks[idx]).unsqueeze(0)  # (1, H, W)
         
         # Binary mask
         mask = (mask > 0).float()
@@ -378,19 +613,51 @@ class TreeDataset(Dataset):
         return image, mask
 
 
+def create_dataloader(dataset: Dataset, batch_size: int = 16, shuffle: bool = True,
+                      num_workers: int = 4, prefetch_factor: int = 4) -> DataLoader:
+    """DataLoader with pinned memory so the trainer's non_blocking copies overlap compute."""
+    kwargs = {}
+    if num_workers > 0:
+        kwargs.update(persistent_workers=True, prefetch_factor=prefetch_factor)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                      pin_memory=torch.cuda.is_available(), **kwargs)
+
+
 class ModelTrainer:
     """Model training utilities."""
     
-    def __init__(self, model: nn.Module, device: str = 'cuda'):
-        self.model = model
+    def __init__(self, model: nn.Module, device: str = 'cuda', compile: bool = False):
         self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
-        self.model.to(self.device)
+        # NHWC layout feeds the tensor-core conv kernels; benchmark picks the fastest per input shape
+        torch.backends.cudnn.benchmark = True
+        self.model = model.to(self.device, memory_format=torch.channels_last)
+        # Forward passes go through the compiled wrapper; self.model keeps the plain state_dict keys
+        self.compiled_model = compile_model(self.model, compile)
+    
+    def _normalize_on_device(self, images: torch.Tensor) -> torch.Tensor:
+        """Copy int16 reflectance patches to the device, then scale to [0, 1] there."""
+        images = images.to(self.device, memory_format=torch.channels_last, non_blocking=True)
+        return images.float().mul_(1 / REFLECTANCE_SCALE).clamp_(0, 1)
+    
+    def train_from_directory(self, data_dir: str, batch_size: int = 16, num_workers: int = 4,
+                             **train_kwargs) -> nn.Module:
+        """Train on the train/val splits written by SatelliteDataPreprocessor.prepare_dataset."""
+        train_loader = create_dataloader(TreeDataset(data_dir, 'train'), batch_size=batch_size,
+                                         shuffle=True, num_workers=num_workers)
+        val_loader = create_dataloader(TreeDataset(data_dir, 'val'), batch_size=batch_size,
+                                       shuffle=False, num_workers=num_workers)
+        return self.train_model(train_loader, val_loader, **train_kwargs)
     
     def train_model(self, train_loader: DataLoader, val_loader: DataLoader, 
                    epochs: int = 50, lr: float = 1e-4, save_path: str = 'best_unet_model.pth') -> nn.Module:
         """Train the model."""
-        criterion = nn.BCELoss()
+        criterion = nn.BCEWithLogitsLoss()
         optimizer = optim.Adam(self.model.parameters(), lr=lr)
+        
+        # Mixed precision on CUDA: bf16 where supported, otherwise fp16 with loss scaling
+        use_amp = self.device.type == 'cuda'
+        amp_dtype = torch.bfloat16 if use_amp and torch.cuda.is_bf16_supported() else torch.float16
+        scaler = torch.cuda.amp.GradScaler(enabled=use_amp and amp_dtype == torch.float16)
         scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, patience=5, factor=0.5)
         
         best_val_loss = float('inf')
@@ -402,13 +669,16 @@ class ModelTrainer:
             self.model.train()
             train_loss = 0
             for images, masks in tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs}'):
-                images, masks = images.to(self.device), masks.to(self.device)
+                images = self._normalize_on_device(images)
+                masks = masks.to(self.device, non_blocking=True)
                 
                 optimizer.zero_grad()
-                outputs = self.model(images)
-                loss = criterion(outputs, masks)
-                loss.backward()
-                optimizer.step()
+                with torch.autocast(self.device.type, dtype=amp_dtype, enabled=use_amp):
+                    outputs = self.compiled_model(images)
+                    loss = criterion(outputs, masks)
+                scaler.scale(loss).backward()
+                scaler.step(optimizer)
+                scaler.update()
                 
                 train_loss += loss.item()
             
@@ -417,9 +687,11 @@ class ModelTrainer:
             val_loss = 0
             with torch.no_grad():
                 for images, masks in val_loader:
-                    images, masks = images.to(self.device), masks.to(self.device)
-                    outputs = self.model(images)
-                    loss = criterion(outputs, masks)
+                    images = self._normalize_on_device(images)
+                    masks = masks.to(self.device, non_blocking=True)
+                    with torch.autocast(self.device.type, dtype=amp_dtype, enabled=use_amp):
+                        outputs = self.compiled_model(images)
+                        loss = criterion(outputs, masks)
                     val_loss += loss.item()
             
             train_loss /= len(train_loader)
@@ -444,40 +716,60 @@ class ModelTrainer:
 class TreeAnalyzer:
     """Tree analysis and carbon estimation."""
     
-    def __init__(self, model_path: str, device: str = 'cuda'):
+    def __init__(self, model_path: str, device: str = 'cuda', compile: bool = False,
+                 upsample: Optional[str] = None):
         self.device = torch.device(device if torch.cuda.is_available() else 'cpu')
-        self.model = UNet(n_channels=6, n_classes=1).to(self.device)
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+        torch.backends.cudnn.benchmark = True
+        state_dict = torch.load(model_path, map_location=self.device)
+        if 'up1.weight' in state_dict:
+            raise RuntimeError(
+                f"{model_path} was trained with the old ConvTranspose2d decoder; "
+                "the decoder now uses Up blocks, so the model must be retrained"
+            )
+        if upsample is None:
+            # Pixel-shuffle decoders reduce to 4x the output channels before the shuffle
+            upsample = 'pixel_shuffle' if state_dict['up1.reduce.weight'].shape[0] == 64 * 4 else 'bilinear'
+        self.model = UNet(n_channels=6, n_classes=1, upsample=upsample).to(
+            self.device, memory_format=torch.channels_last)
+        self.model.load_state_dict(state_dict)
         self.model.eval()
+        self.compiled_model = compile_model(self.model, compile)
     
-    def predict_trees(self, image_path: str, output_path: str) -> np.ndarray:
+    def predict_trees(self, image_path: str, output_path: str, batch_size: int = 32) -> np.ndarray:
         """Predict tree canopy for entire image."""
-        with rasterio.open(image_path) as src:
-            image = src.read()
-            meta = src.meta.copy()
-            height, width = image.shape[1], image.shape[2]
-        
-        # Normalize
-        image = image.astype(np.float32) / 10000.0
-        image = np.clip(image, 0, 1)
-        
         # Predict in patches
         patch_size = 256
         stride = 128
-        prediction = np.zeros((height, width), dtype=np.float32)
-        count = np.zeros((height, width), dtype=np.float32)
         
-        for i in range(0, height - patch_size + 1, stride):
-            for j in range(0, width - patch_size + 1, stride):
-                patch = image[:, i:i+patch_size, j:j+patch_size]
-                patch_tensor = torch.from_numpy(patch).unsqueeze(0).to(self.device)
+        # inference_mode skips autograd bookkeeping entirely; fp16 autocast uses the tensor cores
+        use_amp = self.device.type == 'cuda'
+        with rasterio.Env(**RASTERIO_ENV_OPTIONS), rasterio.open(image_path) as src, \
+                torch.inference_mode(), torch.autocast(self.device.type, dtype=torch.float16, enabled=use_amp):
+            meta = src.meta.copy()
+            height, width = src.height, src.width
+            prediction = np.zeros((height, width), dtype=np.float32)
+            count = np.zeros((height, width), dtype=np.float32)
+            cols = np.arange(0, width - patch_size + 1, stride)
+            
+            # One patch-high strip per row of patches instead of the whole raster; the GDAL
+            # block cache serves the half of each strip shared with the previous row
+            for i in range(0, height - patch_size + 1, stride):
+                strip = src.read(window=Window(0, i, width, patch_size))
                 
-                with torch.no_grad():
-                    pred = self.model(patch_tensor)
-                    pred = pred.squeeze().cpu().numpy()
+                # Normalize
+                strip = np.clip(strip.astype(np.float32) / REFLECTANCE_SCALE, 0, 1)
                 
-                prediction[i:i+patch_size, j:j+patch_size] += pred
-                count[i:i+patch_size, j:j+patch_size] += 1
+                for start in range(0, len(cols), batch_size):
+                    jj = cols[start:start + batch_size]
+                    ii = np.full_like(jj, i)
+                    batch = np.stack([strip[:, :, j:j+patch_size] for j in jj])
+                    
+                    batch = torch.from_numpy(batch).to(self.device, memory_format=torch.channels_last,
+                                                       non_blocking=True)
+                    preds = self.compiled_model(batch).float().sigmoid()
+                    preds = preds[:, 0].cpu().numpy()  # (B, P, P)
+                    
+                    accumulate_patches(preds, ii, jj, prediction, count, patch_size)
         
         # Average overlapping predictions
         prediction = prediction / np.maximum(count, 1)
@@ -492,26 +784,34 @@ class TreeAnalyzer:
     
     def calculate_ndvi(self, image_path: str) -> np.ndarray:
         """Calculate NDVI for health assessment."""
-        with rasterio.open(image_path) as src:
-            red = src.read(3).astype(float) / 10000.0  # B4
-            nir = src.read(4).astype(float) / 10000.0  # B8
-        
-        ndvi = (nir - red) / (nir + red + 1e-8)
-        return np.clip(ndvi, -1, 1)
+        with rasterio.Env(**RASTERIO_ENV_OPTIONS), rasterio.open(image_path) as src:
+            red = src.read(3).astype(np.float32)  # B4
+            nir = src.read(4).astype(np.float32)  # B8
+        
+        # The /10000 reflectance scaling cancels in the ratio; only the epsilon is rescaled
+        eps = np.float32(1e-8 * REFLECTANCE_SCALE)
+        if NUMEXPR_AVAILABLE:
+            ndvi = ne.evaluate("(nir - red) / (nir + red + eps)")
+        else:
+            ndvi = nir - red
+            nir += red
+            nir += eps
+            ndvi /= nir
+        return np.clip(ndvi, -1, 1, out=ndvi)
     
     def assess_tree_health(self, tree_mask: np.ndarray, ndvi: np.ndarray) -> Dict:
         """Classify tree health based on NDVI."""
-        healthy = (ndvi > 0.6) & (tree_mask > 0)
-        moderate = (ndvi > 0.4) & (ndvi <= 0.6) & (tree_mask > 0)
-        stressed = (ndvi > 0.2) & (ndvi <= 0.4) & (tree_mask > 0)
-        unhealthy = (ndvi <= 0.2) & (tree_mask > 0)
+        # 0 = no tree, then unhealthy (<= 0.2), stressed (<= 0.4), moderate (<= 0.6), healthy;
+        # one digitize and one bincount instead of a boolean mask and sum per class
+        categories = np.where(tree_mask > 0, np.digitize(ndvi, [0.2, 0.4, 0.6], right=True) + 1, 0)
+        counts = np.bincount(categories.ravel(), minlength=5)
         
         return {
-            'healthy': int(np.sum(healthy)),
-            'moderate': int(np.sum(moderate)),
-            'stressed': int(np.sum(stressed)),
-            'unhealthy': int(np.sum(unhealthy)),
-            'total_pixels': int(np.sum(tree_mask > 0))
+            'healthy': int(counts[4]),
+            'moderate': int(counts[3]),
+            'stressed': int(counts[2]),
+            'unhealthy': int(counts[1]),
+            'total_pixels': int(counts[1:].sum())
         }
     
     def estimate_carbon(self, tree_mask: np.ndarray, resolution: int = 10) -> Dict:
@@ -535,14 +835,16 @@ class TreeAnalyzer:
     def vectorize_trees(self, tree_mask: np.ndarray, output_shapefile: str, 
                        crs: str, transform) -> gpd.GeoDataFrame:
         """Convert tree mask to vector polygons."""
-        shapes = features.shapes(tree_mask.astype(np.int16), 
-                                mask=tree_mask > 0, 
-                                transform=transform)
+        # Binary uint8 mask: the bool array viewed in place, no int16 copy
+        tree_pixels = tree_mask > 0
+        shapes = features.shapes(tree_pixels.view(np.uint8), mask=tree_pixels, transform=transform)
         
-        records = [{'geometry': shape(geom), 'value': val} 
-                   for geom, val in shapes]
+        # Geometries straight into a column, no intermediate list of dicts; every polygon is a
+        # tree component of the binary mask, so the value column is a constant 1
+        geometries = [shape(geom) for geom, _ in shapes]
         
-        gdf = gpd.GeoDataFrame.from_records(records, crs=crs)
+        gdf = gpd.GeoDataFrame({'value': np.ones(len(geometries), dtype=np.uint8)},
+                               geometry=geometries, crs=crs)
         gdf.to_file(output_shapefile)
         return gdf
 
@@ -615,30 +917,38 @@ class VisualizationUtils:
         """Generate a comprehensive analysis report."""
         total_trees = health_stats['total_pixels']
         
+        # Health shares computed once; an empty mask reports 0% instead of dividing by zero
+        inv_total = 100.0 / total_trees if total_trees else 0.0
+        healthy, moderate, stressed, unhealthy = (
+            health_stats['healthy'], health_stats['moderate'], health_stats['stressed'], health_stats['unhealthy']
+        )
+        carbon_tons = carbon_stats['carbon_tons_per_year']
+        tree_area_ha = carbon_stats['tree_area_ha']
+        
         report = f"""
 EcoMind Urban Forest Analysis Report
 ====================================
 
 TREE COVERAGE SUMMARY
 ---------------------
-Total Tree Area: {carbon_stats['tree_area_ha']:.2f} hectares
+Total Tree Area: {tree_area_ha:.2f} hectares
 Estimated Tree Count: {carbon_stats['tree_count_estimate']:,}
 Tree Coverage: {total_trees:,} pixels
 
 TREE HEALTH ASSESSMENT
 ----------------------
-Healthy Trees: {health_stats['healthy']:,} ({health_stats['healthy']/total_trees*100:.1f}%)
-Moderate Health: {health_stats['moderate']:,} ({health_stats['moderate']/total_trees*100:.1f}%)
-Stressed Trees: {health_stats['stressed']:,} ({health_stats['stressed']/total_trees*100:.1f}%)
-Unhealthy Trees: {health_stats['unhealthy']:,} ({health_stats['unhealthy']/total_trees*100:.1f}%)
+Healthy Trees: {healthy:,} ({healthy * inv_total:.1f}%)
+Moderate Health: {moderate:,} ({moderate * inv_total:.1f}%)
+Stressed Trees: {stressed:,} ({stressed * inv_total:.1f}%)
+Unhealthy Trees: {unhealthy:,} ({unhealthy * inv_total:.1f}%)
 
 ENVIRONMENTAL IMPACT
 --------------------
-Annual CO₂ Sequestration: {carbon_stats['carbon_tons_per_year']:.2f} tons
-Equivalent Cars Offset: {int(carbon_stats['carbon_tons_per_year']/4.6):,} cars/year
-Oxygen Production: {carbon_stats['carbon_tons_per_year']*0.73:.2f} tons/year
-Air Pollutant Removal: {carbon_stats['tree_area_ha']*50:.0f} kg/year
-Stormwater Interception: {carbon_stats['tree_area_ha']*2500:.0f} liters/year
+Annual CO₂ Sequestration: {carbon_tons:.2f} tons
+Equivalent Cars Offset: {int(carbon_tons / 4.6):,} cars/year
+Oxygen Production: {carbon_tons * 0.73:.2f} tons/year
+Air Pollutant Removal: {tree_area_ha * 50:.0f} kg/year
+Stormwater Interception: {tree_area_ha * 2500:.0f} liters/year
 
 RECOMMENDATIONS
 ---------------
@@ -705,7 +1015,7 @@ def create_sample_pipeline():
     print("1. Wait for Google Drive downloads to complete")
     print("2. Update file paths in preprocessor")
     print("3. Run preprocessor.prepare_dataset()")
-    print("4. Train model using ModelTrainer")
+    print("4. Train model using ModelTrainer(UNet()).train_from_directory('./dataset')")
     print("5. Analyze results using TreeAnalyzer")
 
 